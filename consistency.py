@@ -0,0 +1,143 @@
+"""
+This file contains the verification of the consistency between both databases. InfluxDB and PostgreSQL are not written in the
+same transaction (and a write that fails is only printed), so the total_* fields of the points and the rows of the months might
+drift from the daily values. The whole series is read once into numpy arrays and every check is done in a single vectorized pass:
+
+    - the total_* fields of each point must be the cumulative sum of the daily_* fields (with utils.TS_TOTALS = "stored")
+    - each row of the aggregate table must have the sums, the averages and the number of days of the points of its month
+
+The differences found are turned into a repair plan, which is applied with a single batched write to InfluxDB and a single
+transaction in PostgreSQL.
+"""
+import numpy as np
+from colorama import Fore
+import resources as res
+from timeSeriesDB import resources as ts
+from timeSeriesDB.series import CovidSeries
+from relationalDB import resources as rel_db
+import utils
+
+# Maximum difference allowed between an average stored and the one computed. Both are rounded to 2 decimals with the same rule
+# (see timeSeriesDB.series.round_average), so it only absorbs the conversions between numeric and float.
+AVG_TOLERANCE = 0.005
+
+
+def load_series(client):
+    """
+    Read all the points of the time series with a single query
+
+    :param client: the client which is connected to InfluxDB
+    :return: dictionary with the arrays of the series (sorted by time):
+        measurements -> measurement of each point
+        times -> time of each point (as stored)
+        dates -> day of each point (numpy.datetime64)
+        daily -> matrix with the daily_* fields (one row per point)
+        totals -> matrix with the total_* fields (one row per point); None if they are not stored
+    None if the points could not be read
+    """
+    try:
+        points = ts.get_points_after(client, "1970-01-01", included=True)
+    except Exception as e:
+        print(Fore.RED + str(e))
+        return None
+
+    series = {
+        "measurements": [measurement for measurement, _ in points],
+        "times": [point["time"] for _, point in points],
+        "dates": np.array([point["time"][0:10] for _, point in points], dtype="datetime64[D]"),
+        "daily": np.array([[point.get(field) or 0 for field in utils.DAILY_FIELDS] for _, point in points],
+                          dtype=np.int64).reshape(-1, 3),
+        "totals": None
+    }
+
+    if utils.TS_TOTALS != "lazy":
+        series["totals"] = np.array([[point.get(field) or 0 for field in utils.TOTAL_FIELDS] for _, point in points],
+                                    dtype=np.int64).reshape(-1, 3)
+    return series
+
+
+def compute_month_rows(series):
+    """
+    Compute the row of the aggregate table of every month from the daily values
+
+    :param series: the series read with load_series
+    :return: dictionary with the rows (key = (year, month), value = row as in the aggregate table)
+    """
+    months = CovidSeries(series["dates"], series["daily"]).group_by("month")
+
+    rows = {}
+    for year, n_month, sums, averages, days in zip(months["year"].tolist(), months["month"].tolist(), months["sums"].tolist(),
+                                                   months["averages"].tolist(), months["days"].tolist()):
+        key = (year, utils.MONTHS[n_month - 1])
+        rows[key] = (*key, *averages, *sums, days)
+    return rows
+
+
+def verify(client):
+    """
+    Check both databases and build the plan to repair them
+
+    :param client: the client which is connected to InfluxDB
+    :return: dictionary with the repair plan; None if the data could not be read:
+        points -> points of InfluxDB to be written again with the right total_* fields
+        rows -> rows of the aggregate table to be written (missing or wrong)
+        deleted_months -> (year, month) of the rows of the aggregate table without any point
+        checked_points, checked_months -> what has been checked
+    """
+    series = load_series(client)
+    if series is None:
+        return None
+
+    stored_rows = rel_db.get_all_years(cached=False)
+    if stored_rows is None:
+        return None
+
+    plan = {"points": [], "rows": [], "deleted_months": [], "checked_points": len(series["dates"]),
+            "checked_months": len(stored_rows)}
+
+    # The total_* fields must be the cumulative sum of the daily_* fields
+    if series["totals"] is not None and len(series["dates"]):
+        expected_totals = np.cumsum(series["daily"], axis=0)
+        wrong = np.flatnonzero(np.any(series["totals"] != expected_totals, axis=1))
+
+        for position in wrong.tolist():
+            fields = res.create_fields_dict(*series["daily"][position].tolist(), *expected_totals[position].tolist())
+            plan["points"].append({"measurement": series["measurements"][position],
+                                   "tags": ts.get_tags(series["times"][position]),
+                                   "time": series["times"][position], "fields": fields})
+
+    # The rows of the months must match the daily values
+    expected_rows = compute_month_rows(series)
+    stored = {(row[0], row[1]): row for row in stored_rows}
+
+    for key, expected in expected_rows.items():
+        row = stored.get(key)
+        if row is None or tuple(row[5:9]) != expected[5:9] or \
+                any(abs((value or 0) - avg) > AVG_TOLERANCE for value, avg in zip(row[2:5], expected[2:5])):
+            plan["rows"].append(expected)
+
+    plan["deleted_months"] = sorted(key for key in stored if key not in expected_rows)
+    return plan
+
+
+def repair(client, plan):
+    """
+    Apply a repair plan: the points are written with a single batched write and the rows with a single transaction
+
+    :param client: the client which is connected to InfluxDB
+    :param plan: the repair plan built by verify
+    :return: True if everything has been repaired; False otherwise
+    """
+    repaired = True
+
+    if plan["points"]:
+        stats = ts.write_points_in_batches(client, plan["points"])
+        repaired = not stats["failed"]
+
+        # The cached previous points might have the wrong totals
+        res.previous_points_cache.clear()
+
+    if plan["rows"] or plan["deleted_months"]:
+        repaired = rel_db.write_months(plan["rows"], plan["deleted_months"]) and repaired
+
+    return repaired
@@ -1,33 +1,180 @@
+from time import perf_counter
+from colorama import Fore
 import resources as res
+from relationalDB import resources as rel_db
 import logic
+import consistency
 
+# Commands that write to the databases (in a script, the consecutive ones are applied together, see run_script)
+WRITE_COMMANDS = ("insert", "update", "delete", "insert-range")
 
-def run(client):
+
+def run(client, writer=None):
     """
     The user will be asked to enter a command and depending on it, one procedure or another will be completed.
     :param client:
+    :param writer: the write-behind queue (see write_queue.py); None to apply the write commands before asking the next one
     :return:
     """
 
     exit_program = False
     while not exit_program:
 
-        command = input("\n>>").strip().lower()
+        command = clean_command(input("\n>>"))
+
+        # The requests to InfluxDB are counted for each command
+        client.round_trips = 0
+        exit_program = run_command(command, client, writer)
+
+
+def clean_command(text):
+    """
+    Remove the spaces around a command and write its name in lowercase (the arguments are kept as they are, since they might be
+    the name of a file)
+
+    :param text: the command as it has been written
+    :return: the command cleaned
+    """
+    words = text.strip().split(maxsplit=1)
+    if not words:
+        return ""
+    words[0] = words[0].lower()
+    return " ".join(words)
+
+
+def run_command(command, client, writer=None):
+    """
+    Complete the procedure of a command
+
+    :param command: the command introduced by the user
+    :param client: the client which is connected to InfluxDB
+    :param writer: the write-behind queue (see write_queue.py); None to apply the write commands now
+    :return: True if the program has to finish; False otherwise
+    """
+    if command in ("close", "quit", "exit"):
+        return True
+
+    elif writer and command and command.split()[0] in WRITE_COMMANDS:
+        # The command is applied in the background
+        if writer.submit(command):
+            print("Queued!")
+
+    elif command.startswith("export"):
+        # The write commands waiting in the background are applied first, so they are exported too
+        if writer:
+            writer.flush()
+
+        logic.export_data(command, client)
+        res.show_round_trips(client)
+
+    elif command == "flush":
+        if writer:
+            writer.flush()
+        res.show_write_queue_status(writer.get_status() if writer else None)
+
+    elif command in ("verify", "repair"):
+        # The write commands waiting in the background are applied first, so they are checked too
+        if writer:
+            writer.flush()
+
+        try:
+            plan = consistency.verify(client)
+            res.show_repair_plan(plan)
+            if plan and command == "repair" and (plan["points"] or plan["rows"] or plan["deleted_months"]):
+                print("Repaired!" if consistency.repair(client, plan) else "Some changes could not be repaired.")
+        except Exception as e:
+            print(Fore.RED + str(e))
+        res.show_round_trips(client)
+
+    elif command == "status":
+        res.show_write_queue_status(writer.get_status() if writer else None)
+
+    elif "insert-range" in command:
+        logic.insert_range(command, client)
+        res.show_round_trips(client)
+
+    elif "insert" in command or "update" in command or "delete" in command:
+        logic.apply_write_command(command, client)
+        res.show_round_trips(client)
 
-        if command in ("close", "quit", "exit"):
-            exit_program = True
+    elif "stats" in command:
+        logic.show_stats(command, client)
+        res.show_round_trips(client)
 
-        elif "insert" in command:
-            logic.insert_point(command, client)
+    elif "trend" in command:
+        logic.show_trend(command, client)
+        res.show_round_trips(client)
 
-        elif "update" in command:
-            logic.update_point(command, client)
+    elif "months" in command:
+        logic.show_months(command)
 
-        elif "delete" in command:
-            logic.delete_point(command, client)
+    elif "month" in command:
+        logic.show_month(command)
 
-        elif command in ("h", "help", "-h", "-help", "--h", "--help"):
-            res.show_help_commands()
+    elif command == "cache":
+        res.show_cache_stats(rel_db.get_cache_stats())
+
+    elif command in ("h", "help", "-h", "-help", "--h", "--help"):
+        res.show_help_commands()
+
+    else:
+        res.show_error_command(command)
+
+    return False
+
+
+def run_script(script, client):
+    """
+    Run the commands of a script (one per line, the empty lines and the lines starting with # are skipped) without asking the
+    user. The consecutive insert, update, delete and insert-range commands are applied together (see logic.apply_commands), so a
+    whole day of corrections is a single recompute of the totals and a single write per month in the relational DB. The
+    throughput and the requests done to InfluxDB by the whole script are shown at the end.
+
+    :param script: the opened file with the commands (it can be sys.stdin)
+    :param client: the client which is connected to InfluxDB
+    :return:
+    """
+    client.round_trips = 0
+    start = perf_counter()
+    stats = {"commands": 0, "applied": 0, "failed": 0, "written": 0, "deleted": 0, "months": 0}
+
+    write_commands = []
+    for line in script:
+        command = clean_command(line)
+        if not command or command.startswith("#"):
+            continue
+        stats["commands"] += 1
+
+        if command.split()[0] in WRITE_COMMANDS:
+            write_commands.append(command)
+            continue
+
+        # The group of write commands finishes here, so it is applied before running this command
+        apply_write_commands(write_commands, client, stats)
+        write_commands = []
+
+        if run_command(command, client):
+            break
+
+    apply_write_commands(write_commands, client, stats)
+
+    stats["seconds"] = perf_counter() - start
+    stats["round_trips"] = getattr(client, "round_trips", 0)
+    res.show_script_stats(stats)
+
+
+def apply_write_commands(write_commands, client, stats):
+    """
+    Apply a group of consecutive write commands of a script and add its statistics to the ones of the script
+
+    :param write_commands: list of insert, update, delete and insert-range commands
+    :param client: the client which is connected to InfluxDB
+    :param stats: dictionary with the statistics of the script
+    :return:
+    """
+    if not write_commands:
+        return
 
-        else:
-            res.show_error_command(command)
+    group_stats = logic.apply_commands(write_commands, client)
+    for key in ("applied", "failed", "written", "deleted", "months"):
+        stats[key] += group_stats[key]
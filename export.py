@@ -0,0 +1,116 @@
+"""
+This file contains the export of the data to CSV or JSON Lines files. The data is streamed from the databases to the file: the
+points are read from InfluxDB in chunks (chunked responses) and the rows of the relational DB with a server-side cursor, so the
+memory used does not depend on the number of days or years exported.
+"""
+import csv
+import json
+from datetime import datetime
+from timeSeriesDB import resources as ts
+from relationalDB import resources as rel_db
+import utils
+
+# Columns of the exported files
+SERIES_COLUMNS = ["time"] + utils.DAILY_FIELDS + utils.TOTAL_FIELDS
+AGGREGATE_COLUMNS = ["year", "month", "avg_confirmed", "avg_deceased", "avg_recovered", "total_confirmed", "total_deceased",
+                     "total_recovered", "total_days"]
+
+
+def export_series(client, start, end, file_name, chunk_size=utils.EXPORT_CHUNK_SIZE):
+    """
+    Export the points of a range of dates (sorted by time)
+
+    :param client: the client which is connected to InfluxDB
+    :param start: first date of the range (included, YYYY-MM-DD)
+    :param end: last date of the range (included, YYYY-MM-DD)
+    :param file_name: the file where the points are written (.csv or .jsonl)
+    :param chunk_size: maximum number of points of each chunk read from InfluxDB
+    :return: the number of points exported
+    """
+    return write_rows(iter_series(client, start, end, chunk_size), SERIES_COLUMNS, file_name)
+
+
+def export_aggregates(file_name, chunk_size=utils.EXPORT_CHUNK_SIZE):
+    """
+    Export all the rows of the aggregate table of the relational DB (sorted by year and month)
+
+    :param file_name: the file where the rows are written (.csv or .jsonl)
+    :param chunk_size: number of rows fetched from PostgreSQL each time
+    :return: the number of rows exported
+    """
+    return write_rows(rel_db.iter_all_months(chunk_size), AGGREGATE_COLUMNS, file_name)
+
+
+def iter_series(client, start, end, chunk_size=utils.EXPORT_CHUNK_SIZE):
+    """
+    Iterate over the points of a range of dates, reading them from InfluxDB in chunks. With the "monthly" schema each month of
+    the range is read from its measurement one after the other, so the points are sorted by time. With lazy totals the total_*
+    fields are computed on the way.
+
+    :param client: the client which is connected to InfluxDB
+    :param start: first date of the range (included, YYYY-MM-DD)
+    :param end: last date of the range (included, YYYY-MM-DD)
+    :param chunk_size: maximum number of points of each chunk
+    :return: a generator of rows (lists with the values of SERIES_COLUMNS)
+    """
+    totals = ts.get_totals_before(client, start) if utils.TS_TOTALS == "lazy" else None
+
+    for measurement, range_start, range_end in get_query_ranges(start, end):
+        chunks = client.query(f'SELECT {", ".join(utils.DAILY_FIELDS + utils.TOTAL_FIELDS)} FROM "{measurement}" '
+                              f"WHERE time >= '{range_start}' AND time <= '{range_end}'", chunked=True, chunk_size=chunk_size)
+
+        for chunk in chunks:
+            points = chunk.get_points()
+            if totals is not None:
+                points = ts.add_running_totals(points, totals)
+
+            for point in points:
+                yield [point["time"]] + [point.get(field) for field in SERIES_COLUMNS[1:]]
+
+
+def get_query_ranges(start, end):
+    """
+    Split a range of dates in the ranges that have to be queried, so the points are read sorted by time
+
+    :param start: first date of the range (YYYY-MM-DD)
+    :param end: last date of the range (YYYY-MM-DD)
+    :return: list of tuples (measurement, first date, last date): one per month with the "monthly" schema; a single one with
+    the "single" schema
+    """
+    if utils.TS_SCHEMA != "monthly":
+        return [(utils.TS_MEASUREMENT, start, end)]
+
+    ranges = []
+    month_start = datetime.strptime(start, '%Y-%m-%d')
+    last_day = datetime.strptime(end, '%Y-%m-%d')
+    while month_start <= last_day:
+        next_month = datetime(month_start.year + month_start.month // 12, month_start.month % 12 + 1, 1)
+        month_end = min(next_month.toordinal() - 1, last_day.toordinal())
+        ranges.append((ts.get_measurement(month_start), month_start.strftime('%Y-%m-%d'),
+                       datetime.fromordinal(month_end).strftime('%Y-%m-%d')))
+        month_start = next_month
+    return ranges
+
+
+def write_rows(rows, columns, file_name):
+    """
+    Write rows to a CSV file (with a header) or to a JSON Lines file (an object per line), depending on the extension of the file
+
+    :param rows: iterable of rows (lists or tuples with the values of the columns)
+    :param columns: the names of the columns
+    :param file_name: the file (.csv or .jsonl)
+    :return: the number of rows written
+    """
+    n_rows = 0
+    with open(file_name, "w", newline="") as f:
+        if file_name.endswith(".csv"):
+            writer = csv.writer(f)
+            writer.writerow(columns)
+            for row in rows:
+                writer.writerow(row)
+                n_rows += 1
+        else:
+            for row in rows:
+                f.write(json.dumps(dict(zip(columns, row))) + "\n")
+                n_rows += 1
+    return n_rows
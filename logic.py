@@ -1,301 +1,435 @@
 """
 This file contains the main logic of the program in order to insert, delete or update a value to the TimeSeries
 """
+import asyncio
+import numpy as np
 import resources as res
+import export
 from timeSeriesDB import resources as ts
+from timeSeriesDB.series import CovidSeries
 from relationalDB import resources as rel_db
 from colorama import Fore
 import utils
 
 
-def insert_point(command, client):
+def apply_write_command(command, client):
     """
-    Main logic to insert a new point in the InfluxDB. Based on the data entered by the user, we need to get the measurement name
-    where we want to insert the point and the previous point in order to update the total fields (since they are not asked to the user
-    to insert them). Once we have computed and checked that all is in the correct format we insert the point in the corresponding
-    measurement with the current time.
+    Main logic to insert, update or delete a point. The command is turned into the changes of the daily values it produces (see
+    parse_write_command) and they are applied with apply_daily_changes, exactly like the commands of a script or of the
+    write-behind queue, so a command always has the same effect whatever the way it has been run:
 
-    Afterwards, we need to update the values for that specific month in the relational database. For that we need to get the previous data
-    and update each field taking in account the new point inserted. For that, we will add +1 in total days (this is like total points
-    for that month). Moreover, we will add to the corresponding total_* fields the values inserted by the user. For example:
+        insert -> the values of today are stored (if today is already stored, its values are replaced)
+        update -> the values of a day which is already stored are replaced
+        delete -> a day which is already stored is removed
 
-    WHERE:
-        total_recovered -> the new value of total recovered
-        total_previous_recovered -> the value we got by doing a query to the database for the month we want to update the value
-        recovered_today -> the amount of people that have recovered only today (the inserted point)
-
-    total_recovered = total_previous_recovered + recovered_today
+    In InfluxDB the total_* fields of the next points are recomputed (they are the total accumulative), and in the relational
+    database the month of the day receives the difference between the new values and the old ones: one more day only when the
+    day was not stored, and one day less when it is deleted. For example:
 
-    Furthermore, we need also to recompute the average values. However, this will be easy since we have all the data. We only need to
-    divide each total_* field by the total days. For example:
+    WHERE:
+        total_recovered -> the new value of total recovered of the month
+        total_previous_recovered -> the value stored in the database for the month we want to update
+        recovered_new_point -> the amount of people that have recovered that specific day (0 if it has been deleted)
+        recovered_old_point -> the amount of people that was recovered that specific day (0 if it was not stored)
 
-    avg_confirmed = total_recovered / total_days
+    total_recovered = total_previous_recovered + recovered_new_point - recovered_old_point
 
-    Note: we can not use the total*  values from the Time Series DB since they are the total accumulative. In the relational DB
-    we have the total_* value for only that specific month, it is not accumulative. This is why we will have months with bigger
-    numbers than others.
+    The averages are recomputed by the database in the same statement (see relationalDB.resources.apply_month_delta), so two
+    sessions changing the same month at the same time can not lose each other's changes.
 
-    :param command: the command introduced by the user where we have the values for today that will be inserted in the databases
+    :param command: the command introduced by the user (insert, update or delete)
     :param client: the client which is connected to InfluxDB and will be used to interact with the database
     :return:
     """
-    # Let's split the command by spaces and get in a list format so it will be easy to process
-    cmd_list = command.split()
+    changes = parse_write_command(command)
+    if changes is not None:
+        apply_daily_changes(client, changes)
 
-    # Check that each value inserted is in the correct format
-    if res.check_format_insert_point(cmd_list):
 
-        """
-         ########################################## TIME SERIES DB ########################################## 
-        """
-
-        # Get the month which will be the measurement_name where the point will be inserted
-        measurement_name = res.get_current_month()
-
-        # Get the previous point before inserting the current one in order to calculate the total_* fields
-        previous_point = res.get_previous_point(client, measurement_name)
-
-        # Computing the total_* fields using the previous point
-        total_confirmed = int(previous_point["totalconfirmed"]) + int(cmd_list[1])
-        total_deceased = int(previous_point["totaldeceased"]) + int(cmd_list[2])
-        total_recovered = int(previous_point["totalrecovered"]) + int(cmd_list[3])
+def show_month(command):
+    """
+    Show the averages and the totals of a month stored in the relational database. The rows are read through the cache of
+    relationalDB.resources, so asking again for the same month does not query the database until it is written.
 
-        # Get points as dictionary
-        points = res.create_fields_dict(cmd_list[1], cmd_list[2], cmd_list[3], str(total_confirmed), str(total_deceased), str(total_recovered))
+    :param command: the command introduced by the user with the month (YYYY-MM)
+    :return:
+    """
+    cmd_list = command.split()
 
-        # Now we have all the fields in the correct format so we insert them in the database
-        ts.insert_point(client, measurement_name, points)
+    if res.check_format_month(cmd_list):
+        year, n_month = cmd_list[1].split("-")
+        row = rel_db.get_month(int(year), utils.MONTHS[int(n_month) - 1])
+        res.show_aggregate_rows([row] if row else [])
 
 
-        """
-         ########################################## RELATIONAL DB ########################################## 
-        """
+def show_months(command):
+    """
+    Show the averages and the totals of every month of a range of years (or of all the years) stored in the relational database,
+    read through the cache of relationalDB.resources
 
-        # Get in which table we have to make the changes
-        year = res.get_current_time().split("-")[0]
-        table_name = utils.TABLE_NAME + year
+    :param command: the command introduced by the user with the years (none, one or the first and the last one)
+    :return:
+    """
+    cmd_list = command.split()
 
-        # Get the information we had before for that specific month, in order to update it
-        query_month_output = rel_db.get_data(table_name, dicc_conditions={"month": measurement_name})
+    if res.check_format_months(cmd_list):
+        years = [int(year) for year in cmd_list[1:]]
+        if not years:
+            rows = rel_db.get_all_years()
+        else:
+            rows = rel_db.get_years(years[0], years[-1])
+        res.show_aggregate_rows(rows)
 
-        # We are inserting one more data so we have to sum 1 to total days
-        days = int(query_month_output[-1]) + 1
 
-        # Compute total_* using the information we got from the query for the specific month
-        total_confirmed = int(query_month_output[4]) + int(cmd_list[1])
-        total_deceased = int(query_month_output[5]) + int(cmd_list[2])
-        total_recovered = int(query_month_output[6]) + int(cmd_list[3])
+def show_stats(command, client):
+    """
+    Show the statistics of a range of dates: the average cases per day of each window of days and of the whole range. The sums
+    are computed by InfluxDB (see timeSeriesDB.resources.get_window_sums), so only a point per window is read.
 
-        # Update the average values using the new values for that month
-        avg_confirmed = round(total_confirmed / days, 2)
-        avg_deceased = round(total_deceased / days, 2)
-        avg_recovered = round(total_recovered / days, 2)
+    :param command: the command introduced by the user (stats FROM TO [window])
+    :param client: the client which is connected to InfluxDB and will be used to interact with the database
+    :return:
+    """
+    cmd_list = command.split()
 
-        # Update the data in the relational database
-        rel_db.update_data(table_name, measurement_name, avg_confirmed, avg_deceased, avg_recovered, total_confirmed,
-                           total_deceased, total_recovered, days)
+    if res.check_format_stats(cmd_list):
+        window = int(cmd_list[3]) if len(cmd_list) == 4 else utils.STATS_WINDOW_DAYS
+        try:
+            windows = ts.get_window_sums(client, cmd_list[1], cmd_list[2], window)
+        except Exception as e:
+            print(Fore.RED + str(e))
+            return
+        res.show_window_stats(windows, window)
 
 
-def update_point(command, client):
+def show_trend(command, client):
     """
-    Main logic to update a new point in the InfluxDB. Based on the data entered by the user, we need to get the measurement name
-    where we want to update the point and the previous point in order to update the total fields (since they are not asked to the user
-    to insert them). Once we have computed and checked that all is in the correct format we update the point in the corresponding
-    measurement with the time specified by the user.
-
-    Once we updated that specific point, it is time to do some extra work. Since now the total value has changed, we need to update
-    each total_value for the next points!! This means all the points from that day specified by the user to today (or current day).
-    So we will add or subtract the difference to the each total field of the next points. Look at RECALCULATE THE TOTAL OF EACH NEXT POINT
-    to understand better what are we doing.
+    Show the trend of the confirmed cases of each day of a range of dates: the mean of the last days, the growth of the total
+    with respect to the same number of days before and the days the total takes to double at that growth. The series is read
+    with a single query (see timeSeriesDB.series.CovidSeries.from_influxdb) and everything is computed with numpy.
 
-    Afterwards, we need to update the values for that specific month in the relational database. For that we need to get the previous data
-    and update each field taking into account the new values of the updated point. For that, we will take the same number for total days
-    (this is like total points for that month). Moreover, we will update the corresponding total_* fields with the values inserted by the user
-    and subtract the value that was before. For example:
+    :param command: the command introduced by the user (trend FROM TO [window])
+    :param client: the client which is connected to InfluxDB and will be used to interact with the database
+    :return:
+    """
+    cmd_list = command.split()
 
-    WHERE:
-        total_recovered -> the new value of total recovered
-        total_previous_recovered -> the value we got by doing a query to the database for the month we want to update the value
-        recovered_new_point -> the amount of people that have recovered that specific day (the updated point)
-        recovered_old_point -> the amount of people that was recovered that specific day (the old point)
+    if res.check_format_stats(cmd_list):
+        window = int(cmd_list[3]) if len(cmd_list) == 4 else utils.STATS_WINDOW_DAYS
 
-    total_recovered = total_previous_recovered + recovered_new_point - recovered_old_point
+        # The days before the range are needed for the first days of the range
+        first_date = np.datetime64(cmd_list[1]) - window
+        try:
+            series = CovidSeries.from_influxdb(client, str(first_date), cmd_list[2])
+        except Exception as e:
+            print(Fore.RED + str(e))
+            return
 
-    Furthermore, we need also to recompute the average values. However, this will be easy since we have all the data. We only need to
-    divide each total_* field by the total days. For example:
+        in_range = series.dates >= np.datetime64(cmd_list[1])
+        res.show_trend(series.dates[in_range], series.column("dailyconfirmed")[in_range],
+                       series.rolling_mean("dailyconfirmed", window)[in_range],
+                       series.growth_rate("totalconfirmed", window)[in_range],
+                       series.doubling_time("totalconfirmed", window)[in_range], window)
 
-    avg_confirmed = total_recovered / total_days
 
-    Note: we can not use the total*  values from the Time Series DB since they are the total accumulative. In the relational DB
-    we have the total_* value for only that specific month, it is not accumulative. This is why we will have months with bigger
-    numbers than others.
+def export_data(command, client):
+    """
+    Export the points of a range of dates or the months of the relational DB to a CSV or JSON Lines file. The data is streamed
+    from the databases to the file (see export.py), so it can be as long as needed.
 
-    :param command: the command introduced by the user where we have the values for today that will be inserted in the databases
+    :param command: the command introduced by the user (export series FROM TO FILE or export months FILE)
     :param client: the client which is connected to InfluxDB and will be used to interact with the database
     :return:
     """
-    # Let's split the command by spaces and get in a list format so it will be easy to process
     cmd_list = command.split()
 
-    # Check that each value inserted is in the correct format
-    if res.check_format_update_point(cmd_list):
-
-        """
-         ########################################## TIME SERIES DB ########################################## 
-        """
-
-        # Get the month which will be the measurement_name where the point will be updated
-        measurement_name = res.get_month_from_data(cmd_list[4])
+    if res.check_format_export(cmd_list):
+        try:
+            if cmd_list[1] == "series":
+                n_rows = export.export_series(client, cmd_list[2], cmd_list[3], cmd_list[4])
+            else:
+                n_rows = export.export_aggregates(cmd_list[2])
+            print(f"{n_rows} rows exported to {cmd_list[-1]}")
+        except Exception as e:
+            print(Fore.RED + str(e))
 
-        # Get the date that identifies the point in the measurement, so we can update that point
-        date = cmd_list[4]
 
-        # Get the point that will be updated
-        current_point = ts.get_point(client, measurement_name, date)
+def apply_commands(commands, client):
+    """
+    Apply a group of insert, update, delete and insert-range commands together. Each command is checked and applied in order over the days
+    that are affected, as if they were run one by one, but the databases are only written once at the end (see
+    apply_daily_changes): a single recompute of the total_* fields and a single write to the relational DB per month.
 
-        # The point might not be in the database!
-        if len(current_point) == 0:
-            print(Fore.RED + "Error! Can't update cause this day is not stored in the database.")
-            return
+    :param commands: list of insert, update, delete and insert-range commands (like the ones introduced by the user)
+    :param client: the client which is connected to InfluxDB and will be used to interact with the database
+    :return: a dictionary with the number of commands applied and failed (see also apply_daily_changes)
+    """
+    changes = []
+    failed = 0
+    for command in commands:
+        command_changes = parse_write_command(command)
+        if command_changes is None:
+            failed += 1
         else:
-            # It is a dictionary inside a list, inside another list (if not empty)
-            current_point = current_point[0][0]
-
-        # Get previous point before updating the current one in order to calculate the total_*
-        previous_point = res.get_previous_point(client, measurement_name, date)
+            changes.extend(command_changes)
 
-        # Computing the total_* fields using the previous point
-        total_confirmed = int(previous_point["totalconfirmed"]) + int(cmd_list[1])
-        total_deceased = int(previous_point["totaldeceased"]) + int(cmd_list[2])
-        total_recovered = int(previous_point["totalrecovered"]) + int(cmd_list[3])
+    stats = apply_daily_changes(client, changes)
+    stats["failed"] += failed
+    return stats
 
-        # Get points as dictionary
-        points = res.create_fields_dict(cmd_list[1], cmd_list[2], cmd_list[3], str(total_confirmed), str(total_deceased), str(total_recovered))
 
-        # Now we have all the fields in the correct format so we update them in the database
-        ts.update_point(client, measurement_name, points, date)
-
-        # --------------- RECALCULATE THE TOTAL OF EACH NEXT POINT ---------------
-        #
-        #   new_total_next_point = old_total_next_point + (new_total_current_point - old_total_current_point)
-        #                                                 |__________________________________________________|
-        #                                                                          |
-        #                                               We are passing this part of the formula to the function
-        #
+def parse_write_command(command):
+    """
+    Check a write command (insert, update, delete or insert-range) and get the changes of the daily values it produces
 
-        # Since we updated a point we need to compute the difference to sum or subtract to the total value
-        res.recompute_total_fields_next_points(client, date,
-                                               total_confirmed - int(current_point["dailyconfirmed"]),
-                                               total_deceased - int(current_point["dailydeceased"]),
-                                               total_recovered - int(current_point["dailyrecovered"]))
+    :param command: the command introduced by the user
+    :return: list of changes (see apply_daily_changes); None if the command is not correct
+    """
+    cmd_list = command.split()
 
+    if cmd_list[0] == "insert":
+        if res.check_format_insert_point(cmd_list):
+            return [(res.get_current_time(), (int(cmd_list[1]), int(cmd_list[2]), int(cmd_list[3])), False)]
+    elif cmd_list[0] == "update":
+        if res.check_format_update_point(cmd_list):
+            return [(cmd_list[4], (int(cmd_list[1]), int(cmd_list[2]), int(cmd_list[3])), True)]
+    elif cmd_list[0] == "delete":
+        if res.check_format_delete_point(cmd_list):
+            return [(cmd_list[1], None, True)]
+    elif cmd_list[0] == "insert-range":
+        if res.check_format_insert_range(cmd_list):
+            if len(cmd_list) == 2:
+                return read_daily_rows(cmd_list[1])
+
+            values = (int(cmd_list[3]), int(cmd_list[4]), int(cmd_list[5]))
+            dates = np.arange(np.datetime64(cmd_list[1]), np.datetime64(cmd_list[2]) + 1)
+            return [(str(date), values, False) for date in dates]
+    else:
+        print("Incorrect format!")
+
+    return None
+
+
+def insert_range(command, client):
+    """
+    Insert (or replace) the points of many days at once, instead of running an insert for each day. The days can be given as a
+    range of dates with the same values for every day, or as a file with a row per day (YYYY-MM-DD confirmed deceased recovered,
+    separated by spaces or commas). All of them are applied together (see apply_daily_changes): the total_* fields are computed
+    with a single prefix sum, the points are written in a single batch and each month of the relational DB is written once.
 
-        """
-         ########################################## RELATIONAL DB ########################################## 
-        """
+    :param command: the command introduced by the user (insert-range FROM TO confirmed deceased recovered or insert-range FILE)
+    :param client: the client which is connected to InfluxDB and will be used to interact with the database
+    :return:
+    """
+    changes = parse_write_command(command)
+    if changes is None:
+        return
 
-        # Get in which tables we have to make the changes
-        year = date.split("-")[0]
-        table = utils.TABLE_NAME + year
+    stats = apply_daily_changes(client, changes)
+    if stats["error"] is None:
+        print(f"{stats['applied']} days inserted: {stats['written']} points written, {stats['months']} months updated")
 
-        query_month_output = rel_db.get_data(table, dicc_conditions={"month": measurement_name})
 
-        # We are just updating a point that already exists so there is no need to modify the number of total days (== total points in that month)
-        days = query_month_output[-1]
+def read_daily_rows(file_name):
+    """
+    Read a file with the values of a day in each row (YYYY-MM-DD confirmed deceased recovered, separated by spaces or commas).
+    The empty rows, the rows starting with # and a header row are skipped.
 
-        res.recompute_values_for_month(table, measurement_name, days,
-                                       int(query_month_output[4]) + int(cmd_list[1]) - int(current_point["dailyconfirmed"]),
-                                       int(query_month_output[5]) + int(cmd_list[2]) - int(current_point["dailydeceased"]),
-                                       int(query_month_output[6]) + int(cmd_list[3]) - int(current_point["dailyrecovered"]))
+    :param file_name: the name of the file
+    :return: list of changes (see apply_daily_changes); None if the file could not be read or a row is not correct
+    """
+    changes = []
+    try:
+        with open(file_name) as rows_file:
+            for n_row, row in enumerate(rows_file, start=1):
+                row_list = row.replace(",", " ").split()
+                if not row_list or row_list[0].startswith("#") or (n_row == 1 and not row_list[0][0].isdigit()):
+                    continue
+
+                if not res.check_format_daily_row(row_list):
+                    print(Fore.RED + f"Error! Row {n_row} of {file_name} is not correct: {row.strip()}")
+                    return None
+                changes.append((row_list[0], (int(row_list[1]), int(row_list[2]), int(row_list[3])), False))
+    except OSError as e:
+        print(e)
+        return None
+
+    return changes
+
+
+def apply_daily_changes(client, changes):
+    """
+    Apply a list of changes of the daily values to both databases with the minimum number of requests:
 
+        1. The points from the first day changed are read with a single query (and the previous point, usually cached)
+        2. The changes are applied in order over these points in memory
+        3. The total_* fields of every next point are recomputed with a prefix sum (numpy.cumsum), so each point is only written once
+        4. The deleted points are removed with a single request and the changed points are written with a single batched write
+        5. The changes of each month are added up and sent to the relational DB with one statement per month, at the same time as
+           the writes to InfluxDB (see write_both_databases)
 
-def delete_point(command, client):
+    :param client: the client which is connected to InfluxDB and will be used to interact with the database
+    :param changes: list of tuples (date YYYY-MM-DD, (confirmed, deceased, recovered) or None to delete the day, True if the day
+    must already be stored), in the order they have to be applied
+    :return: a dictionary with the statistics:
+        applied -> number of changes applied
+        failed -> number of changes that could not be applied (e.g. updating a day which is not stored)
+        written -> number of points written to InfluxDB
+        deleted -> number of points deleted from InfluxDB
+        months -> number of months written to the relational DB
+        error -> the error of the writes to the databases; None if they have been written
     """
-    Main logic to delete a point in the InfluxDB. Based on the data entered by the user, we need to get the measurement name
-    where we want to delete the point.
+    stats = {"applied": 0, "failed": 0, "written": 0, "deleted": 0, "months": 0, "error": None}
+    if not changes:
+        return stats
+
+    first_date = min(date for date, _, _ in changes)
+
+    # Daily values of the days stored from the first day changed (key = YYYY-MM-DD)
+    try:
+        stored_points = {point["time"][0:10]: (measurement_name, point)
+                         for measurement_name, point in ts.get_points_after(client, first_date, included=True)}
+    except Exception as e:
+        stats["error"] = str(e)
+        print(Fore.RED + str(e))
+        return stats
+    old_values = {date: tuple(point[field] for field in utils.DAILY_FIELDS) for date, (_, point) in stored_points.items()}
+
+    # Apply the changes in order
+    new_values = dict(old_values)
+    for date, values, must_exist in changes:
+        if must_exist and date not in new_values:
+            print(Fore.RED + f"Error! Can't change {date} cause this day is not stored in the database.")
+            stats["failed"] += 1
+            continue
+
+        if values is None:
+            del new_values[date]
+        else:
+            new_values[date] = values
+        stats["applied"] += 1
+
+    changed_dates = sorted(date for date in set(old_values) | set(new_values) if old_values.get(date) != new_values.get(date))
+    if not changed_dates:
+        return stats
+
+    # Add up the changes of each month (key = (year, month))
+    month_deltas = {}
+    for date in changed_dates:
+        old = old_values.get(date, (0, 0, 0))
+        new = new_values.get(date, (0, 0, 0))
+        delta = month_deltas.setdefault((int(date[0:4]), res.get_month_from_data(date)), [0, 0, 0, 0])
+        for position in range(3):
+            delta[position] += new[position] - old[position]
+        delta[3] += (date in new_values) - (date in old_values)
+
+    # ########################################## TIME SERIES DB ##########################################
+    def write_time_series():
+        # Delete the points of the days removed
+        deleted = [(stored_points[date][0], stored_points[date][1]["time"]) for date in changed_dates if date not in new_values]
+        if not ts.delete_points(client, deleted):
+            raise RuntimeError(f"{len(deleted)} points could not be deleted from InfluxDB")
+        stats["deleted"] = len(deleted)
+
+        # Compute the new points (with lazy totals only the days changed have to be written)
+        new_points = []
+        if utils.TS_TOTALS == "lazy":
+            for date in changed_dates:
+                if date in new_values:
+                    new_points.append(create_day_point(stored_points, date, res.create_daily_fields_dict(*new_values[date])))
+        else:
+            previous_point = res.get_previous_point(client, first_date)
+            previous_totals = np.array([previous_point[field] for field in utils.TOTAL_FIELDS], dtype=np.int64)
 
-    Once we deleted that specific point, it is time to do some extra work. Since now the total value has changed, we need to update
-    each total_value for the next points!! This means all the points from that day specified by the user to today (or current day).
-    So we will subtract that points each total value to the each total field of the next points. Look at RECALCULATE THE TOTAL OF EACH NEXT POINT
-    to understand better what are we doing.
+            # The totals of every day are the totals of the previous point plus the cumulative sum of the daily values
+            dates = sorted(new_values)
+            daily = np.array([new_values[date] for date in dates], dtype=np.int64).reshape(-1, 3)
+            totals = np.cumsum(daily, axis=0) + previous_totals
 
-    Afterwards, we need to update the values for that specific month in the relational database. For that we need to get the previous data
-    and update each field taking into account that we deleted a point. For that, we will subtract 1 for total days since we deleted a day
-    (this is like total points for that month). Moreover, we will update the corresponding total_* fields with the values inserted by the user
-    and subtract the value that was before. For example:
+            for date, values, day_totals in zip(dates, daily.tolist(), totals.tolist()):
+                fields = res.create_fields_dict(*values, *day_totals)
 
-    WHERE:
-        total_recovered -> the new value of total recovered
-        total_previous_recovered -> the value we got by doing a query to the database for the month we want to update the value
-        recovered_from_deleted_point -> the amount of people that have recovered that specific day but now we do not have that day
-         anymore (the deleted point)
+                # Only the points whose values have changed are written
+                stored_point = stored_points.get(date, (None, {}))[1]
+                if any(stored_point.get(field) != value for field, value in fields.items()):
+                    new_points.append(create_day_point(stored_points, date, fields))
 
-    total_recovered = total_previous_recovered - recovered_from_deleted_point
+        write_stats = ts.write_points_in_batches(client, new_points)
+        stats["written"] = write_stats["points"]
+        res.forget_previous_points(first_date)
 
-    Furthermore, we need also to recompute the average values. However, this will be easy since we have all the data. We only need to
-    divide each total_* field by the total days. For example:
+        if write_stats["failed"]:
+            raise RuntimeError(f"{write_stats['failed']} points could not be written to InfluxDB")
 
-    avg_confirmed = total_recovered / total_days
+    # ########################################## RELATIONAL DB ##########################################
+    def write_relational():
+        failed_months = []
+        for (year, month), delta in month_deltas.items():
+            if rel_db.apply_month_delta(year, month, *delta) is None:
+                failed_months.append(f"{month} {year}")
+        stats["months"] = len(month_deltas) - len(failed_months)
 
-    Note: we can not use the total*  values from the Time Series DB since they are the total accumulative. In the relational DB
-    we have the total_* value for only that specific month, it is not accumulative. This is why we will have months with bigger
-    numbers than others.
+        if failed_months:
+            raise RuntimeError(f"The months {', '.join(failed_months)} could not be written to the relational DB")
 
-    :param command: the command introduced by the user where we have the values for today that will be inserted in the databases
-    :param client: the client which is connected to InfluxDB and will be used to interact with the database
-    :return:
-    """
-    # Let's split the command by spaces and get in a list format so it will be easy to process
-    cmd_list = command.split()
+    # Both databases are written at the same time
+    try:
+        write_both_databases(write_time_series, write_relational)
+    except Exception as e:
+        stats["error"] = str(e)
+        print(Fore.RED + str(e))
 
-    # Check that each value inserted is in the correct format
-    if res.check_format_delete_point(cmd_list):
+    return stats
 
-        """
-         ########################################## TIME SERIES DB ########################################## 
-        """
 
-        # Get the month which will be the measurement_name where the point will be deleted
-        measurement_name = res.get_month_from_data(cmd_list[1])
+def create_day_point(stored_points, date, fields):
+    """
+    Create the point (in json protocol) of a day, in the measurement where it is stored (or where it has to be stored if it is new)
 
-        # Get the date that identifies the point in the measurement, so we can delete that point
-        date = cmd_list[1]
+    :param stored_points: dictionary with the points stored (key = YYYY-MM-DD, value = (measurement name, point))
+    :param date: the day of the point (YYYY-MM-DD)
+    :param fields: dictionary with the fields of the point
+    :return: the point in json protocol
+    """
+    if date in stored_points:
+        measurement_name, point = stored_points[date]
+        time = point["time"]
+    else:
+        measurement_name, time = ts.get_measurement(date), date
 
-        # Get the point that will be deleted
-        current_point = ts.get_point(client, measurement_name, date)
-        print(current_point)
+    return {"measurement": measurement_name, "tags": ts.get_tags(date), "time": time, "fields": fields}
 
-        if len(current_point) == 0:
-            print(Fore.RED + "Error! Can't delete cause this day is not stored in the database.")
-            return
-        else:
-            # It is a dictionary inside a list, inside another list (if not empty)
-            current_point = current_point[0][0]
 
-        # Delete the point
-        ts.delete_data(client, measurement_name, date)
+def write_both_databases(write_time_series, write_relational):
+    """
+    Do the writes of a command to InfluxDB and to PostgreSQL. Once the changes have been computed they do not depend on each other,
+    so with utils.CONCURRENT_WRITES both are run at the same time and the command only waits for the slowest database instead of
+    for both of them one after the other.
 
-        # --------------- RECALCULATE THE TOTAL OF EACH NEXT POINT ---------------
-        # Since we deleted a point we need to subtract the total value to each next point (since it is an accumulative value)
-        res.recompute_total_fields_next_points(client, date,
-                                               - int(current_point["dailyconfirmed"]),
-                                               - int(current_point["dailydeceased"]),
-                                               - int(current_point["dailyrecovered"]))
+    :param write_time_series: function that does the writes to InfluxDB
+    :param write_relational: function that does the writes to PostgreSQL
+    :return:
+    :raises Exception: the first error of the writes (when they are run at the same time, both of them finish before it is raised)
+    """
+    if not utils.CONCURRENT_WRITES:
+        write_time_series()
+        write_relational()
+        return
 
-        """
-         ########################################## RELATIONAL DB ########################################## 
-        """
+    asyncio.run(run_concurrently(write_time_series, write_relational))
 
-        # Get in which tables we have to make the changes
-        year = date.split("-")[0]
-        table = utils.TABLE_NAME + year
 
-        query_month_output = rel_db.get_data(table, dicc_conditions={"month": measurement_name})
+async def run_concurrently(*writes):
+    """
+    Run blocking functions at the same time, each one in a thread of the executor of the event loop (influxdb and psycopg2 are
+    not asynchronous, but they release the GIL while they wait for the network)
 
-        # We deleted a point we need to modify the number of total days (== total points in that month)
-        days = query_month_output[-1] - 1
+    :param writes: the functions to be run
+    :return:
+    :raises Exception: the first error of the functions, once all of them have finished
+    """
+    results = await asyncio.gather(*(asyncio.to_thread(write) for write in writes), return_exceptions=True)
 
-        res.recompute_values_for_month(table, measurement_name, days,
-                                       int(query_month_output[4]) - int(current_point["dailyconfirmed"]),
-                                       int(query_month_output[5]) - int(current_point["dailydeceased"]),
-                                       int(query_month_output[6]) - int(current_point["dailyrecovered"]))
+    for result in results:
+        if isinstance(result, Exception):
+            raise result
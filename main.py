@@ -1,6 +1,11 @@
+import sys
+import argparse
 from influxdb import InfluxDBClient
+from timeSeriesDB import resources as ts
+from relationalDB import resources as rel_db
 import resources as res
 import controller as contr
+import write_queue
 import utils
 
 
@@ -9,8 +14,13 @@ def main():
     Program starting and main logic
     :return:
     """
-    # Create new client to connect with InfluxDB
-    client = InfluxDBClient(host="localhost", port=8086)
+    parser = argparse.ArgumentParser(description="Covid19 India time series")
+    parser.add_argument("--script", metavar="FILE",
+                        help="run the commands of FILE (one per line, - to read them from the standard input) instead of asking them")
+    args = parser.parse_args()
+
+    # Create new client to connect with InfluxDB (counting the requests done by each command)
+    client = ts.count_round_trips(InfluxDBClient(host=utils.TS_HOST, port=utils.TS_PORT))
 
     # Welcome!
     res.show_title()
@@ -19,7 +29,21 @@ def main():
     client.switch_database(utils.TS_DB_NAME)
 
     # Start!
-    contr.run(client)
+    if args.script == "-":
+        contr.run_script(sys.stdin, client)
+    elif args.script:
+        with open(args.script) as script:
+            contr.run_script(script, client)
+    elif utils.WRITE_BEHIND:
+        # The write commands are applied in the background (all of them are applied before finishing)
+        writer = write_queue.WriteBehindQueue(client)
+        contr.run(client, writer)
+        writer.close()
+    else:
+        contr.run(client)
+
+    # Close the connections to PostgreSQL
+    rel_db.close_pool()
 
     # Goodbye!
     res.exit_text()
@@ -0,0 +1,85 @@
+"""
+RUN THIS FILE TO COMPARE THE PREPARED STATEMENTS WITH THE QUERIES BUILT WITH F-STRINGS
+
+For each query shape (month lookup and month update) the same query is executed many times on the same connection, first built
+with an f-string (parsed and planned by the server every time) and then with the prepared statement of relationalDB.statements.
+The updates are done inside a transaction which is rolled back, so the data is not changed.
+"""
+from time import perf_counter
+from relationalDB import resources as res
+from relationalDB.statements import STATEMENTS, execute_prepared
+import utils
+
+# Number of times each query is executed
+ITERATIONS = 2000
+
+# Table, year and month used in the benchmark (the month must exist)
+TABLE_NAME = utils.AGGREGATE_TABLE
+YEAR = utils.FIRST_YEAR
+MONTH = "May"
+
+
+def benchmark(name, execute):
+    """
+    Execute a query ITERATIONS times and print how long it took
+
+    :param name: the name of the benchmark
+    :param execute: function that receives a cursor and executes the query once
+    :return: the seconds it took
+    """
+    with res.get_cursor(commit=False) as cur:
+        # Warm up (the prepared statement is prepared here)
+        execute(cur)
+
+        start = perf_counter()
+        for _ in range(ITERATIONS):
+            execute(cur)
+            cur.fetchall()
+        seconds = perf_counter() - start
+
+    print(f"{name}: {seconds:.3f} s -> {ITERATIONS / seconds:.0f} queries/s")
+    return seconds
+
+
+def build_f_string(name, params):
+    """
+    Build the query of a statement of STATEMENTS with the values written in it (like an f-string)
+
+    :param name: the name of the statement
+    :param params: the values of the parameters
+    :return: the query
+    """
+    query = STATEMENTS[name][1].format(table=TABLE_NAME)
+
+    # From the last parameter, so $1 does not replace the beginning of $10
+    for position in range(len(params), 0, -1):
+        value = params[position - 1]
+        query = query.replace(f"${position}", f"'{value}'" if isinstance(value, str) else str(value))
+    return query + ";"
+
+
+def main():
+    """
+    Run the benchmark of each query shape
+    :return:
+    """
+    row = res.get_month(YEAR, MONTH)
+    if not row:
+        print(f"The month {MONTH} {YEAR} does not exist in {TABLE_NAME}, fill the database first")
+        return
+
+    print("\n###### MONTH LOOKUP ######")
+    f_string = benchmark("f-string", lambda cur: cur.execute(build_f_string("month_lookup", (YEAR, MONTH))))
+    prepared = benchmark("prepared", lambda cur: execute_prepared(cur, "month_lookup", TABLE_NAME, (YEAR, MONTH)))
+    print(f"Speed-up: {f_string / prepared:.2f}x")
+
+    print("\n###### MONTH UPDATE ######")
+    f_string = benchmark("f-string", lambda cur: cur.execute(build_f_string("month_delta", (YEAR, MONTH, 0, 0, 0, 0))))
+    prepared = benchmark("prepared", lambda cur: execute_prepared(cur, "month_delta", TABLE_NAME, (YEAR, MONTH, 0, 0, 0, 0)))
+    print(f"Speed-up: {f_string / prepared:.2f}x")
+
+    res.close_pool()
+
+
+if __name__ == '__main__':
+    main()
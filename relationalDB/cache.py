@@ -0,0 +1,101 @@
+"""
+This file will contain the cache of the monthly aggregates read from PostgreSQL. The rows are kept in memory for a while, so
+reading the same months again (e.g. a dashboard refreshing the monthly averages) does not query the database every time. When a
+month is written, only the cached reads that contain that month are removed.
+"""
+import threading
+from time import monotonic
+from collections import OrderedDict
+
+
+class AggregateCache:
+    """
+    LRU cache with a time to live. Each entry remembers which years (and month) it contains, so a write can invalidate exactly the
+    entries that are affected by it.
+    """
+
+    def __init__(self, max_entries, ttl_seconds):
+        """
+        :param max_entries: maximum number of entries (the least recently used one is removed when it is full)
+        :param ttl_seconds: seconds an entry can be used since it was stored
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+        # Incremented on every invalidation, so a read that started before a write is not stored (see put)
+        self.version = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key):
+        """
+        Get an entry of the cache
+
+        :param key: the key of the entry
+        :return: tuple (True, value) if the entry is in the cache and has not expired; (False, None) otherwise
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry["expires"] < monotonic():
+                if entry is not None:
+                    del self.entries[key]
+                self.misses += 1
+                return False, None
+
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return True, entry["value"]
+
+    def put(self, key, value, version, years=None, month=None):
+        """
+        Store an entry in the cache
+
+        :param key: the key of the entry
+        :param value: the value to be stored
+        :param version: the version of the cache when the value was read; if something has been invalidated since then, the value
+        might be old and it is not stored
+        :param years: the years contained by the value; None if it contains all the years
+        :param month: the month contained by the value; None if it contains all the months of the years
+        :return:
+        """
+        with self.lock:
+            if version != self.version:
+                return
+
+            self.entries[key] = {"value": value, "expires": monotonic() + self.ttl_seconds, "years": years, "month": month}
+            self.entries.move_to_end(key)
+
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, year=None, month=None):
+        """
+        Remove the entries that contain a month of a year
+
+        :param year: the year written; None to remove all the entries
+        :param month: the month written; None if all the months of the year have been written
+        :return:
+        """
+        with self.lock:
+            self.version += 1
+
+            for key, entry in list(self.entries.items()):
+                if year is None or (
+                        (entry["years"] is None or year in entry["years"]) and
+                        (entry["month"] is None or month is None or entry["month"] == month)):
+                    del self.entries[key]
+                    self.invalidations += 1
+
+    def get_stats(self):
+        """
+        :return: dictionary with the hits, the misses, the evictions, the invalidations and the entries of the cache
+        """
+        with self.lock:
+            return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                    "invalidations": self.invalidations, "entries": len(self.entries)}
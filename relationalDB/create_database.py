@@ -5,13 +5,17 @@ This file will contain the main logic to fill the database with the data which w
 
 Note: we have created the user and the database using pgAdmin.
 """
+from influxdb import InfluxDBClient
 from relationalDB import resources as res
 import utils
 
-# We will compute for each month
-for month in utils.MONTHS:
-
-    # Compute and write the data to the postgres database
-    res.compute_data_from_time_series(utils.TABLE_NAME, utils.TS_DB_NAME, month)
+# Create new client to connect with InfluxDB
+try:
+    client = InfluxDBClient(host=utils.TS_HOST, port=utils.TS_PORT, database=utils.TS_DB_NAME)
+except Exception as e:
+    print(e)
+else:
+    # Compute the data of all the months with a single query and write it to the postgres database in a single transaction
+    res.rebuild_from_time_series(client)
 
 # Check pgAdmin to see the results :)
@@ -0,0 +1,74 @@
+"""
+RUN THIS FILE ONCE TO MOVE THE TABLES OF ONE YEAR (india_covid_2020, india_covid_2021...) TO THE AGGREGATE TABLE
+
+The first versions of the project created a table per year, so a question about several years needed a query per table. This
+file copies the months of every table of one year to utils.AGGREGATE_TABLE (keyed by year and month, and partitioned by year if
+utils.AGGREGATE_PARTITIONED) and drops the old tables. Everything is done in a single transaction, so if something fails nothing
+is changed.
+"""
+from relationalDB import resources as res
+import utils
+
+# Columns of the old tables (the aggregate table has the same ones plus the year)
+COLUMNS = "month, avg_confirmed, avg_deceased, avg_recovered, total_confirmed, total_deceased, total_recovered, total_days"
+
+
+def get_year_tables(cur):
+    """
+    Get the tables of one year that still exist
+
+    :param cur: the cursor (like a pointer to the database)
+    :return: list of tuples (year, table name) sorted by year
+    """
+    cur.execute("SELECT table_name FROM information_schema.tables WHERE table_schema = 'public' AND table_name ~ %s;",
+                (f"^{utils.TABLE_NAME}[0-9]{{4}}$",))
+    return sorted((int(table[len(utils.TABLE_NAME):]), table) for table, in cur.fetchall())
+
+
+def migrate_table(cur, year, table_name):
+    """
+    Copy the months of a table of one year to the aggregate table and drop it
+
+    :param cur: the cursor (like a pointer to the database)
+    :param year: the year of the table
+    :param table_name: the name of the table
+    :return: the number of months copied
+    """
+    res.create_year_partition(cur, year)
+
+    cur.execute(f"INSERT INTO {utils.AGGREGATE_TABLE} (year, {COLUMNS}) SELECT %s, {COLUMNS} FROM {table_name} "
+                f"ON CONFLICT (year, month) DO UPDATE SET "
+                f"avg_confirmed=EXCLUDED.avg_confirmed, avg_deceased=EXCLUDED.avg_deceased, "
+                f"avg_recovered=EXCLUDED.avg_recovered, total_confirmed=EXCLUDED.total_confirmed, "
+                f"total_deceased=EXCLUDED.total_deceased, total_recovered=EXCLUDED.total_recovered, "
+                f"total_days=EXCLUDED.total_days;", (year,))
+    months = cur.rowcount
+
+    cur.execute(f"DROP TABLE {table_name};")
+    print(f"Table {table_name}: {months} months copied")
+    return months
+
+
+def main():
+    """
+    Migrate all the tables of one year
+    :return:
+    """
+    try:
+        with res.get_cursor() as cur:
+            tables = get_year_tables(cur)
+            if not tables:
+                print("There are no tables of one year, nothing to migrate")
+                return
+
+            months = sum(migrate_table(cur, year, table_name) for year, table_name in tables)
+        print(f"\n{months} months of {len(tables)} years are now in {utils.AGGREGATE_TABLE}")
+    except Exception as e:
+        print(e)
+        print("Nothing has been changed")
+    finally:
+        res.close_pool()
+
+
+if __name__ == '__main__':
+    main()
@@ -3,46 +3,163 @@ This file will contain all the functions which will allow us to interact with Po
 
 Note: we have created the user and the database using pgAdmin.
 """
-import psycopg2
+import threading
+from time import monotonic
+from contextlib import contextmanager
+from psycopg2 import pool
+from psycopg2.extras import execute_values
+from relationalDB.statements import PreparedConnection, execute_prepared
+from relationalDB.cache import AggregateCache
 from timeSeriesDB import resources as res
-from influxdb import InfluxDBClient
+from timeSeriesDB.series import round_average
+import utils
+
+# Pool of connections shared by the whole process (it is created the first time it is needed, see get_pool)
+connection_pool = None
+pool_lock = threading.Lock()
+
+# Columns of the aggregate table (see create_table)
+TABLE_COLUMNS = "(year integer, month text, avg_confirmed float, avg_deceased float, avg_recovered float, " \
+                "total_confirmed integer, total_deceased integer, total_recovered integer, total_days integer, " \
+                "PRIMARY KEY (year, month))"
+
+# Years that we know that can be written in the aggregate table (so we do not have to create the table or its partition)
+created_years = set()
+
+# Reads of the aggregate table (see get_month, get_years and get_all_years); the writes remove the reads they change
+aggregate_cache = AggregateCache(utils.AGGREGATE_CACHE_SIZE, utils.AGGREGATE_CACHE_TTL_SECONDS)
+
+# Last time each connection of the pool was used (key = id of the connection), to know when it has to be checked
+last_used = {}
+
+
+def get_pool():
+    """
+    Get the pool of connections of the process, creating it the first time
+
+    :return: the pool of connections to the database
+    """
+    global connection_pool
+    with pool_lock:
+        if connection_pool is None:
+            connection_pool = pool.ThreadedConnectionPool(utils.PG_POOL_MIN, utils.PG_POOL_MAX, database=utils.PG_DATABASE,
+                                                          user=utils.PG_USER, password=utils.PG_PASSWORD,
+                                                          connection_factory=PreparedConnection)
+    return connection_pool
+
+
+def close_pool():
+    """
+    Close all the connections of the pool
+
+    :return:
+    """
+    global connection_pool
+    with pool_lock:
+        if connection_pool is not None:
+            connection_pool.closeall()
+            connection_pool = None
+            last_used.clear()
 
 
 def connect_postgres():
     """
-    This function will create a session for us in order to work with the created database in PostgreSQL
-    Since the database is already created, the values of these fields will be permanents
+    This function will take a connection from the pool in order to work with the created database in PostgreSQL. If the
+    connection has not been used for a while, it is checked first and replaced if it is broken (e.g. the server was restarted).
+    The connection must be given back with release_connection.
 
-    :return: the connection which will allow us to interact with the database; None if we could not create a connection
+    :return: the connection which will allow us to interact with the database; None if we could not get a connection
     """
     try:
-        conn = psycopg2.connect(database="covid_world", user="postgres", password="postgres")
+        conn = get_pool().getconn()
+
+        # The connections that have just been opened do not need to be checked
+        idle_seconds = monotonic() - last_used.get(id(conn), monotonic())
+        if conn.closed or idle_seconds > utils.PG_HEALTH_CHECK_SECONDS:
+            if not is_healthy(conn):
+                get_pool().putconn(conn, close=True)
+                conn = get_pool().getconn()
+
         return conn
     except Exception as e:
         print(e)
         return None
 
 
-def commit_changes(conn, cur):
+def is_healthy(conn):
+    """
+    Check that a connection can still be used
+
+    :param conn: the connection to be checked
+    :return: True if it works; False otherwise
+    """
+    if conn.closed:
+        return False
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT 1;")
+        conn.rollback()
+        return True
+    except Exception:
+        return False
+
+
+def release_connection(conn):
     """
-    Commit and save changes of the operation we did
+    Give a connection back to the pool (it is closed if it is broken)
 
-    :param conn: the connection that will allow us to interact with the database
-    :param cur: the pointer to the database
+    :param conn: the connection taken with connect_postgres
     :return:
     """
-    conn.commit()  # <--- makes sure the change is shown in the database
-    conn.close()
-    cur.close()
+    last_used[id(conn)] = monotonic()
+    get_pool().putconn(conn, close=bool(conn.closed))
+
+
+@contextmanager
+def get_cursor(commit=True, name=None):
+    """
+    Context manager which gives a cursor of a connection of the pool. When the block finishes the changes are committed (or
+    rolled back if there was an error) and the connection is given back to the pool. For example:
+
+        with get_cursor() as cur:
+            cur.execute(...)
+
+    :param commit: False for read-only blocks (the transaction is rolled back instead of committed)
+    :param name: the name of the cursor to get a server-side cursor (the rows are fetched from the server in blocks while they
+    are iterated, instead of all at once); None for a normal cursor
+    :return: the cursor (like a pointer to the database)
+    """
+    conn = connect_postgres()
+
+    # If we could not connected to the database we will exit
+    if not conn:
+        raise ConnectionError("Could not connect to the database")
+
+    try:
+        with conn.cursor(name) as cur:
+            yield cur
+        if commit:
+            conn.commit()  # <--- makes sure the change is shown in the database
+        else:
+            conn.rollback()
+    except Exception:
+        if not conn.closed:
+            conn.rollback()
+        raise
+    finally:
+        release_connection(conn)
 
 
-def create_table(table_name):
+def create_table(table_name=utils.AGGREGATE_TABLE):
     """
-    Create a new table to our relational database
+    Create the aggregate table of our relational database (if it does not exist). Each row is a month of a year, so all the years
+    are in the same table and a query over several years is a single query over its primary key. If utils.AGGREGATE_PARTITIONED,
+    the table is partitioned by year (see create_year_partition).
     The fields can not be changed since they are related to the fields we have created in the Time Series Database
 
     Fields
     -------------------------------------------------------------------------------------
+    year (integer, PK) -> the year of the month
     month (text, PK) -> will be used to relate the relational DB with the measurements of the Time Series Database
     avg_confirmed (float) -> will contain the average number of confirmed cases in a month
     avg_deceased (float) -> will contain the average number of deceased cases in a month
@@ -57,66 +174,51 @@ def create_table(table_name):
     :param table_name: the name to be given to the table
     :return:
     """
-    conn = connect_postgres()
-
-    # If we could not connected to the database we will exit
-    if not conn:
-        print("Could not connect to the database")
-        return
-
-    # Like a pointer to the database
-    cur = conn.cursor()
-
     try:
-        cur.execute(f"CREATE TABLE {table_name} (month text PRIMARY KEY, avg_confirmed float, avg_deceased float, avg_recovered float, "
-                    f"total_confirmed integer, total_deceased integer, total_recovered integer, total_days integer);")
+        with get_cursor() as cur:
+            create_table_if_needed(cur, table_name)
         print("Table created!")
     except Exception as e:
         print(e)
-    else:
-        commit_changes(conn, cur)
 
 
-def insert_data(table_name, month, avg_confirmed, avg_deceased, avg_recovered, total_confirmed, total_deceased, total_recovered, total_days):
+def create_table_if_needed(cur, table_name=utils.AGGREGATE_TABLE):
     """
-    Insert the computed results for the specific month in the table
+    Create the aggregate table with the cursor given (nothing is done if it already exists)
 
-    :param table_name: the name of the table where we want to insert the data
-    :param month: the name of the month which is a unique value
-    :param avg_confirmed: the average number of confirmed cases for the month
-    :param avg_deceased: the average number of deceased cases for the month
-    :param avg_recovered: the average number of recovered cases for the month
-    :param total_confirmed: the total number of confirmed cases for the month
-    :param total_deceased: the total number of deceased cases for the month
-    :param total_recovered: the total number of recovered cases for the month
-    :param total_days: the total number of days for which we have data for that month
+    :param cur: the cursor (like a pointer to the database)
+    :param table_name: the name of the table
     :return:
     """
-    conn = connect_postgres()
+    partition = " PARTITION BY LIST (year)" if utils.AGGREGATE_PARTITIONED else ""
+    cur.execute(f"CREATE TABLE IF NOT EXISTS {table_name} {TABLE_COLUMNS}{partition};")
 
-    # If we could not connected to the database we will exit
-    if not conn:
-        return
 
-    # Like a pointer to the database
-    cur = conn.cursor()
+def create_year_partition(cur, year, table_name=utils.AGGREGATE_TABLE):
+    """
+    Make sure that the rows of a year can be written in the aggregate table: the table is created if it does not exist and, if it
+    is partitioned, also the partition of the year (e.g. india_covid_monthly_2020). The years already checked by this process are
+    remembered, so the statements are only sent the first time.
 
-    try:
-        cur.execute(f"INSERT INTO {table_name} VALUES ('{month}', {avg_confirmed}, {avg_deceased}, {avg_recovered}, {total_confirmed}, {total_deceased}"
-                    f", {total_recovered}, {total_days});")
-        print("Data inserted!")
-    except Exception as e:
-        print(e)
-    else:
-        commit_changes(conn, cur)
+    :param cur: the cursor (like a pointer to the database)
+    :param year: the year
+    :param table_name: the name of the aggregate table
+    :return:
+    """
+    if (table_name, year) in created_years:
+        return
+
+    create_table_if_needed(cur, table_name)
+    if utils.AGGREGATE_PARTITIONED:
+        cur.execute(f"CREATE TABLE IF NOT EXISTS {table_name}_{year} PARTITION OF {table_name} FOR VALUES IN ({int(year)});")
 
 
-def update_data(table_name, month, avg_confirmed, avg_deceased, avg_recovered, total_confirmed, total_deceased, total_recovered, total_days):
+def insert_data(year, month, avg_confirmed, avg_deceased, avg_recovered, total_confirmed, total_deceased, total_recovered, total_days):
     """
-    Update the computed results for the specific month in the table
+    Insert the computed results for the specific month of a year in the aggregate table
 
-    :param table_name: the name of the table where we want to insert the data
-    :param month: the name of the month which is a unique value
+    :param year: the year of the month
+    :param month: the name of the month (the PK is the year and the month)
     :param avg_confirmed: the average number of confirmed cases for the month
     :param avg_deceased: the average number of deceased cases for the month
     :param avg_recovered: the average number of recovered cases for the month
@@ -126,148 +228,224 @@ def update_data(table_name, month, avg_confirmed, avg_deceased, avg_recovered, t
     :param total_days: the total number of days for which we have data for that month
     :return:
     """
-    conn = connect_postgres()
-
-    # If we could not connected to the database we will exit
-    if not conn:
-        return
+    try:
+        with get_cursor() as cur:
+            create_year_partition(cur, year)
+            execute_prepared(cur, "month_insert", utils.AGGREGATE_TABLE, (year, month, avg_confirmed, avg_deceased, avg_recovered,
+                                                                         total_confirmed, total_deceased, total_recovered,
+                                                                         total_days))
+        created_years.add((utils.AGGREGATE_TABLE, year))
+        print("Data inserted!")
+    except Exception as e:
+        print(e)
+    finally:
+        aggregate_cache.invalidate(year, month)
 
-    # Like a pointer to the database
-    cur = conn.cursor()
 
+def apply_month_delta(year, month, d_confirmed, d_deceased, d_recovered, d_days):
+    """
+    Apply the changes produced by a point (inserted, updated or deleted) to a month in a single statement: the total_* fields and
+    the total days are incremented by the database and the avg_* fields are recomputed with the new values. Since nothing is read
+    before writing, two sessions changing the same month at the same time can not lose each other's changes. If a point is added
+    and the month (or the partition of the year) does not exist yet, it is created; an update or a deletion needs the month to
+    be stored already.
+
+    :param year: the year of the month
+    :param month: the name of the month (the PK is the year and the month)
+    :param d_confirmed: the confirmed cases to be added to the month (negative to subtract)
+    :param d_deceased: the deceased cases to be added to the month (negative to subtract)
+    :param d_recovered: the recovered cases to be added to the month (negative to subtract)
+    :param d_days: the days to be added to the month (1 for a new point, 0 for an update and -1 for a deletion)
+    :return: the row of the month with the new values; None if it could not be updated
+    """
+    params = (year, month, d_confirmed, d_deceased, d_recovered, d_days)
     try:
-        cur.execute(f"UPDATE {table_name} SET avg_confirmed={avg_confirmed}, avg_deceased={avg_deceased}, avg_recovered={avg_recovered}, "
-                    f"total_confirmed={total_confirmed}, total_deceased={total_deceased}, total_recovered={total_recovered}, total_days={total_days} "
-                    f"WHERE month='{month}';")  # PK
+        with get_cursor() as cur:
+            if d_days > 0:
+                create_year_partition(cur, year)
+                execute_prepared(cur, "month_delta_insert", utils.AGGREGATE_TABLE, params)
+            else:
+                # Without new days the month must already exist (creating it would leave a row without days)
+                execute_prepared(cur, "month_delta", utils.AGGREGATE_TABLE, params)
+            row = cur.fetchone()
+
+        if row is None:
+            print(f"Error! Can't update {month} of {year} cause it is not stored in the relational database.")
+            return None
+
+        if d_days > 0:
+            created_years.add((utils.AGGREGATE_TABLE, year))
         print("Data updated!")
+        return row
     except Exception as e:
         print(e)
-    else:
-        commit_changes(conn, cur)
+        return None
+    finally:
+        aggregate_cache.invalidate(year, month)
 
 
-def delete_data(table_name, month):
+def get_month(year, month):
     """
-    Delete a row of the table by his PK
+    Get the row of a month of a year, from the cache if it has been read recently
 
-    :param table_name: the name of the table which contain the row we want to delete
-    :param month: the PK that will allow to identify the row and delete it
-    :return:
+    :param year: the year of the month
+    :param month: the name of the month
+    :return: the row of the month; None if it does not exist or could not be read
     """
-    conn = connect_postgres()
-
-    # If we could not connected to the database we will exit
-    if not conn:
-        return
-
-    # Like a pointer to the database
-    cur = conn.cursor()
+    key = ("month", year, month)
+    found, row = aggregate_cache.get(key)
+    if found:
+        return row
 
+    version = aggregate_cache.version
     try:
-        cur.execute(f"DELETE FROM {table_name} WHERE month='{month}';")  # PK
-        print("Data deleted!")
+        with get_cursor(commit=False) as cur:
+            execute_prepared(cur, "month_lookup", utils.AGGREGATE_TABLE, (year, month))
+            row = cur.fetchone()
     except Exception as e:
         print(e)
-    else:
-        commit_changes(conn, cur)
+        return None
 
+    aggregate_cache.put(key, row, version, years={year}, month=month)
+    return row
 
-def get_data(table_name, atr_tuple=None, dicc_conditions=None):
+
+def get_years(first_year, last_year):
     """
-    Get data from a table
-    :param table_name: Name of the table where we will select the data
-    :param atr_list: Tuple of attributes que want to select
-    :param dicc_conditions: Dictionary of conditions with format key = column, value = value column
-    :return: List of data selected
+    Get the rows of all the months of a range of years with a single query (sorted by year and month), from the cache if they
+    have been read recently
+
+    :param first_year: the first year of the range
+    :param last_year: the last year of the range (included)
+    :return: tuple with the rows of the months; None if they could not be read
     """
-    conn = connect_postgres()
+    key = ("years", first_year, last_year)
+    found, rows = aggregate_cache.get(key)
+    if found:
+        return rows
 
-    # If we could not connected to the database we will exit
-    if not conn:
-        print("Could not connect to the database")
-        return
+    version = aggregate_cache.version
+    try:
+        with get_cursor(commit=False) as cur:
+            cur.execute(f"SELECT * FROM {utils.AGGREGATE_TABLE} WHERE year BETWEEN %s AND %s "
+                        f"ORDER BY year, array_position(%s, month);", (first_year, last_year, utils.MONTHS))
+            rows = tuple(cur.fetchall())
+    except Exception as e:
+        print(e)
+        return None
 
-    # Like a pointer to the database
-    cur = conn.cursor()
+    aggregate_cache.put(key, rows, version, years=range(first_year, last_year + 1))
+    return rows
 
-    try:
-        columns_select = '*'
-        if atr_tuple:
-            columns_select = atr_tuple
-        if dicc_conditions:
-            condition = ''
-            keys = list(dicc_conditions.keys())
-            condition += f"{keys[0]}='{dicc_conditions[keys[0]]}'"
-            for key_id in range(1, len(keys)):
-                key = list(dicc_conditions.keys())[key_id]
-                condition += f"AND {key}='{dicc_conditions[key]}'"
-            print(f"SELECT {columns_select} FROM {table_name} WHERE {condition};")
-            cur.execute(f"SELECT {columns_select} FROM {table_name} WHERE {condition};")
-        else:
-            cur.execute(f"SELECT {columns_select} FROM {table_name};")
 
-        return list(cur.fetchall())[0]
+def get_all_years(cached=True):
+    """
+    Get the rows of all the months of all the years with a single query (sorted by year and month), from the cache if they have
+    been read recently
+
+    :param cached: False to always read them from the database (e.g. to check them, since other processes might have written it)
+    :return: tuple with the rows of the months; None if they could not be read
+    """
+    key = ("all",)
+    found, rows = aggregate_cache.get(key) if cached else (False, None)
+    if found:
+        return rows
+
+    version = aggregate_cache.version
+    try:
+        with get_cursor(commit=False) as cur:
+            cur.execute(f"SELECT * FROM {utils.AGGREGATE_TABLE} ORDER BY year, array_position(%s, month);", (utils.MONTHS,))
+            rows = tuple(cur.fetchall())
     except Exception as e:
         print(e)
+        return None
+
+    aggregate_cache.put(key, rows, version)
+    return rows
 
 
-def compute_data_from_time_series(table_name, db_name, month):
+def iter_all_months(block_size=utils.EXPORT_CHUNK_SIZE):
     """
-    Read data from the time series data and compute the necessary data in order to write to the relational table
-    :param table_name: where we will write the data computed
-    :param db_name: the name of the time series database from which we will collect the data
-    :param month: the measurement name from which we will read the data and the PK to be writen in the relational database
-    :return:
+    Iterate over all the rows of the aggregate table (sorted by year and month) with a server-side cursor, so only a block of rows
+    is in memory at the same time whatever the number of years
+
+    :param block_size: number of rows fetched from the server each time
+    :return: a generator of rows
+    """
+    with get_cursor(commit=False, name="export_months") as cur:
+        cur.itersize = block_size
+        cur.execute(f"SELECT * FROM {utils.AGGREGATE_TABLE} ORDER BY year, array_position(%s, month);", (utils.MONTHS,))
+        for row in cur:
+            yield row
+
+
+def get_cache_stats():
+    """
+    :return: dictionary with the hits, the misses, the evictions, the invalidations and the entries of the cache of the reads
+    """
+    return aggregate_cache.get_stats()
+
+
+def rebuild_from_time_series(client):
+    """
+    Rebuild all the monthly rows from the time series database. InfluxDB computes the sums of every month of every year with a
+    single request (see timeSeriesDB.resources.get_monthly_sums) and all the rows of the aggregate table are replaced by them with
+    a bulk insert in a single transaction, so a full rebuild is only a handful of round trips.
+
+    :param client: the client that connects with InfluxDB, with the time series database selected
+    :return: the number of rows written
+    """
+    monthly_sums = res.get_monthly_sums(client)
+
+    rows = []
+    for month_sums in monthly_sums:
+        days = month_sums["total_days"]
+        rows.append((
+            int(month_sums["year"]), month_sums["month"],
+            round_average(month_sums["total_confirmed"], days),
+            round_average(month_sums["total_deceased"], days),
+            round_average(month_sums["total_recovered"], days),
+            month_sums["total_confirmed"], month_sums["total_deceased"], month_sums["total_recovered"], days))
+
+    # The months that are not in the time series anymore are removed in the same transaction
+    if not write_months(rows, replace_all=True):
+        return 0
+
+    print(f"{len(monthly_sums)} months written!")
+    return len(monthly_sums)
+
+
+def write_months(rows, deleted_months=(), replace_all=False):
+    """
+    Write (insert or replace) and delete rows of the aggregate table in a single transaction: all the rows are written with a
+    bulk insert and all the months deleted with a single statement
+
+    :param rows: list of rows (year, month, avg_confirmed, avg_deceased, avg_recovered, total_confirmed, total_deceased,
+    total_recovered, total_days)
+    :param deleted_months: list of tuples (year, month) of the rows to be deleted
+    :param replace_all: True to delete all the rows of the table first, so only the rows given are left
+    :return: True if everything has been written; False otherwise
     """
-    # Create new client to connect with InfluxDB
     try:
-        client = InfluxDBClient(host="localhost", port=8086)
+        with get_cursor() as cur:
+            if replace_all:
+                create_table_if_needed(cur, utils.AGGREGATE_TABLE)
+                cur.execute(f"DELETE FROM {utils.AGGREGATE_TABLE};")
+            for year in sorted({row[0] for row in rows}):
+                create_year_partition(cur, year)
+            if rows:
+                execute_values(cur, f"INSERT INTO {utils.AGGREGATE_TABLE} VALUES %s ON CONFLICT (year, month) DO UPDATE SET "
+                                    f"avg_confirmed=EXCLUDED.avg_confirmed, avg_deceased=EXCLUDED.avg_deceased, "
+                                    f"avg_recovered=EXCLUDED.avg_recovered, total_confirmed=EXCLUDED.total_confirmed, "
+                                    f"total_deceased=EXCLUDED.total_deceased, total_recovered=EXCLUDED.total_recovered, "
+                                    f"total_days=EXCLUDED.total_days;", rows)
+            if deleted_months:
+                execute_values(cur, f"DELETE FROM {utils.AGGREGATE_TABLE} WHERE (year, month) IN (VALUES %s);",
+                               deleted_months)
+        created_years.update((utils.AGGREGATE_TABLE, row[0]) for row in rows)
+        return True
     except Exception as e:
         print(e)
-    else:
-        # Select database
-        res.select_database(client, db_name)
-
-        lista_tablas = get_data('information_schema.tables', ('table_name'), {'table_schema': 'public'})
-        if lista_tablas:
-            lista_tablas = [tupla[0] for tupla in lista_tablas]
-        else:
-            lista_tablas = []
-        print(f"lista tablas: {lista_tablas}")
-
-        # init
-        dicc_years = {}
-
-        # Get the data we inserted in the time series database of each month
-        query_output = res.get_month_data_time_series(client, month)
-
-        # Compute data
-        for data in query_output:
-            # Check the year of the data
-            time = data['time'].split("-")[0]
-
-            # If is a new year of this month we creat a new key for this year with the values, we need this cause we
-            # store all the years data in the same mesuarement in influxdb
-            if time not in list(dicc_years.keys()):
-                dicc_years[time] = {'total_confirmed': 0, 'total_deceased': 0, 'total_recovered': 0, 'days': 0,
-                                    'avg_confirmed': 0, 'avg_deceased': 0, 'avg_recovered': 0}
-                if table_name+time not in lista_tablas:
-                    create_table(table_name+time)
-                    lista_tablas.append(table_name+time)
-            dicc_years[time]['total_confirmed'] += int(data['dailyconfirmed'])
-            dicc_years[time]['total_deceased'] += int(data['dailydeceased'])
-            dicc_years[time]['total_recovered'] += int(data['dailyrecovered'])
-            dicc_years[time]['days'] += 1
-
-        for key in list(dicc_years.keys()):
-            days = dicc_years[key]['days']
-            dicc_years[key]['avg_confirmed'] = round(dicc_years[key]['total_confirmed'] / days, 2)
-            dicc_years[key]['avg_deceased'] = round(dicc_years[key]['total_deceased'] / days, 2)
-            dicc_years[key]['avg_recovered'] = round(dicc_years[key]['total_recovered'] / days, 2)
-            # Write the data into Table
-            insert_data(table_name+key, month, dicc_years[key]['avg_confirmed'], dicc_years[key]['avg_deceased'],
-                        dicc_years[key]['avg_recovered'], dicc_years[key]['total_confirmed'],
-                        dicc_years[key]['total_deceased'], dicc_years[key]['total_recovered'], days)
-
-
-print(get_data('india_covid_2020', dicc_conditions={"month": 'May'}))
\ No newline at end of file
+        return False
+    finally:
+        aggregate_cache.invalidate()
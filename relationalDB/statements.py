@@ -0,0 +1,77 @@
+"""
+This file will contain the statements that are prepared in PostgreSQL. The queries with a fixed shape (get, insert and apply
+the changes of a month of a year) are prepared once per connection and table, and then only executed with their parameters, so
+the server does not have to parse and plan them again on every call.
+"""
+from psycopg2 import extensions, errors
+
+# Statements that can be prepared (key = name, value = (types of the parameters, statement with $1, $2... as parameters)).
+# {table} is replaced by the name of the table, so each table has its own prepared statement.
+STATEMENTS = {
+    "month_lookup": (
+        "integer, text",
+        "SELECT * FROM {table} WHERE year = $1 AND month = $2"),
+    "month_insert": (
+        "integer, text, float, float, float, integer, integer, integer, integer",
+        "INSERT INTO {table} VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9)"),
+    "month_delta": (
+        "integer, text, integer, integer, integer, integer",
+        "UPDATE {table} AS t SET "
+        "total_confirmed = t.total_confirmed + $3, total_deceased = t.total_deceased + $4, "
+        "total_recovered = t.total_recovered + $5, total_days = t.total_days + $6, "
+        "avg_confirmed = ROUND((t.total_confirmed + $3)::numeric / NULLIF(t.total_days + $6, 0), 2), "
+        "avg_deceased = ROUND((t.total_deceased + $4)::numeric / NULLIF(t.total_days + $6, 0), 2), "
+        "avg_recovered = ROUND((t.total_recovered + $5)::numeric / NULLIF(t.total_days + $6, 0), 2) "
+        "WHERE year = $1 AND month = $2 "
+        "RETURNING *"),
+    "month_delta_insert": (
+        "integer, text, integer, integer, integer, integer",
+        "INSERT INTO {table} AS t VALUES ($1, $2, "
+        "ROUND($3::numeric / NULLIF($6, 0), 2), ROUND($4::numeric / NULLIF($6, 0), 2), ROUND($5::numeric / NULLIF($6, 0), 2), "
+        "$3, $4, $5, $6) "
+        "ON CONFLICT (year, month) DO UPDATE SET "
+        "total_confirmed = t.total_confirmed + $3, total_deceased = t.total_deceased + $4, "
+        "total_recovered = t.total_recovered + $5, total_days = t.total_days + $6, "
+        "avg_confirmed = ROUND((t.total_confirmed + $3)::numeric / NULLIF(t.total_days + $6, 0), 2), "
+        "avg_deceased = ROUND((t.total_deceased + $4)::numeric / NULLIF(t.total_days + $6, 0), 2), "
+        "avg_recovered = ROUND((t.total_recovered + $5)::numeric / NULLIF(t.total_days + $6, 0), 2) "
+        "RETURNING *"),
+}
+
+
+class PreparedConnection(extensions.connection):
+    """
+    Connection to PostgreSQL which remembers the statements that have been prepared in its session (the prepared statements
+    only exist in the session where they were prepared)
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prepared = set()
+
+
+def execute_prepared(cur, name, table_name, params):
+    """
+    Execute a statement of STATEMENTS, preparing it first if it has not been prepared yet in the session of the cursor
+
+    :param cur: the cursor (its connection must be a PreparedConnection)
+    :param name: the name of the statement in STATEMENTS
+    :param table_name: the table where the statement is executed
+    :param params: the values of the parameters of the statement
+    :return:
+    """
+    statement_name = f"{name}_{table_name}".replace(".", "_")
+
+    if statement_name not in cur.connection.prepared:
+        types, statement = STATEMENTS[name]
+        cur.execute(f"PREPARE {statement_name} ({types}) AS {statement.format(table=table_name)};")
+
+        # Prepared statements are not transactional, so it exists even if the transaction is rolled back later
+        cur.connection.prepared.add(statement_name)
+
+    try:
+        cur.execute(f"EXECUTE {statement_name} ({', '.join(['%s'] * len(params))});", params)
+    except errors.InvalidSqlStatementName:
+        # The session does not have it (e.g. it was deallocated), it will be prepared again the next time
+        cur.connection.prepared.discard(statement_name)
+        raise
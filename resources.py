@@ -5,12 +5,14 @@ import colorama
 from colorama import Fore
 from datetime import datetime
 from timeSeriesDB import resources as res_ts
-from relationalDB import resources as res_rl
 import utils
 
 # Once is enough
 colorama.init(autoreset=True)
 
+# Cache of the previous point of each date (key = YYYY-MM-DD, value = point or None), see get_previous_point
+previous_points_cache = {}
+
 
 def show_title():
     """
@@ -44,6 +46,32 @@ def show_help_commands():
         "\n\tto be able do identify the point in the TimeSeriesDB and in the relational DB.")
     print("\n* delete " + Fore.CYAN + "YYYY-MM-DD")
     print("\tInsert the timestamp, and the point to be removed will be identified.")
+    print("\n* insert-range " + Fore.CYAN + "YYYY-MM-DD YYYY-MM-DD confirmed deceased recovered")
+    print("\tInsert the same cases for every day between both dates (included).")
+    print("\n* insert-range " + Fore.CYAN + "file")
+    print("\tInsert the cases of every row of the file (YYYY-MM-DD confirmed deceased recovered, separated by spaces or commas).")
+    print("\n* stats " + Fore.CYAN + "YYYY-MM-DD YYYY-MM-DD [window_days]")
+    print("\tShow the average cases per day of each window of days (7 by default) between both dates, and of the whole range.")
+    print("\n* trend " + Fore.CYAN + "YYYY-MM-DD YYYY-MM-DD [window_days]")
+    print("\tShow the confirmed cases of each day between both dates with their mean, growth and doubling time over the window.")
+    print("\n* month " + Fore.CYAN + "YYYY-MM")
+    print("\tShow the averages and the totals of a month stored in the relational DB.")
+    print("\n* months " + Fore.CYAN + "[first_year [last_year]]")
+    print("\tShow the averages and the totals of every month of the years (all the years if none is given).")
+    print("\n* export series " + Fore.CYAN + "YYYY-MM-DD YYYY-MM-DD file")
+    print("\tExport the points between both dates to a .csv or .jsonl file.")
+    print("\n* export months " + Fore.CYAN + "file")
+    print("\tExport all the months of the relational DB to a .csv or .jsonl file.")
+    print("\n* verify")
+    print("\tCheck that the total_* fields and the months of the relational DB match the daily values, and show what is wrong.")
+    print("\n* repair")
+    print("\tCheck both databases like verify and write again what is wrong.")
+    print("\n* status")
+    print("\tShow the write commands waiting to be applied in the background (with utils.WRITE_BEHIND).")
+    print("\n* flush")
+    print("\tWait until all the write commands waiting in the background have been applied.")
+    print("\n* cache")
+    print("\tShow the hits and the misses of the cache of the relational DB reads.")
     print("\n* exit, close, quit")
     print("\tWrite one of the options above to finish the program.")
 
@@ -57,6 +85,157 @@ def show_error_command(command):
     print(Fore.RED + "Error! Command [" + command + "] does not exist or is not implemented yet.")
 
 
+def show_aggregate_rows(rows):
+    """
+    Print the rows of the aggregate table of the relational database
+
+    :param rows: list of rows (year, month, avg_confirmed, avg_deceased, avg_recovered, total_confirmed, total_deceased,
+    total_recovered, total_days)
+    :return:
+    """
+    if not rows:
+        print("There is no data for these months.")
+        return
+
+    print(Fore.CYAN + f"{'year':>5} {'month':<10} {'avg_conf':>10} {'avg_dec':>9} {'avg_rec':>10} {'total_conf':>11} "
+                      f"{'total_dec':>10} {'total_rec':>11} {'days':>5}")
+    for row in rows:
+        print(f"{row[0]:>5} {row[1]:<10} {row[2]:>10} {row[3]:>9} {row[4]:>10} {row[5]:>11} {row[6]:>10} {row[7]:>11} {row[8]:>5}")
+
+
+def show_window_stats(windows, window):
+    """
+    Print the average cases per day of each window of days and of the whole range
+
+    :param windows: list of dictionaries with the sums of each window (see timeSeriesDB.resources.get_window_sums)
+    :param window: number of days of each window
+    :return:
+    """
+    if not windows:
+        print("There is no data for these dates.")
+        return
+
+    print(Fore.CYAN + f"{'from':<11} {'days':>5} {'avg_confirmed':>14} {'avg_deceased':>13} {'avg_recovered':>14}")
+    for window_sums in windows:
+        print(f"{window_sums['time'][0:10]:<11} {window_sums['days']:>5} "
+              f"{window_sums['dailyconfirmed'] / window_sums['days']:>14.2f} "
+              f"{window_sums['dailydeceased'] / window_sums['days']:>13.2f} "
+              f"{window_sums['dailyrecovered'] / window_sums['days']:>14.2f}")
+
+    days = sum(window_sums["days"] for window_sums in windows)
+    averages = [sum(window_sums[field] for window_sums in windows) / days for field in utils.DAILY_FIELDS]
+    print(Fore.CYAN + f"{'whole range':<11} {days:>5} {averages[0]:>14.2f} {averages[1]:>13.2f} {averages[2]:>14.2f}"
+                      f"   ({len(windows)} windows of {window} days)")
+
+
+def show_trend(dates, daily, means, growth, doubling, window):
+    """
+    Print the trend of the confirmed cases of each day
+
+    :param dates: the days
+    :param daily: the confirmed cases of each day
+    :param means: the mean of the confirmed cases of the last days of each day
+    :param growth: the growth of the total confirmed cases of each day with respect to some days before
+    :param doubling: the days the total confirmed cases take to double at that growth (NaN if it does not grow)
+    :param window: number of days of the mean and of the growth
+    :return:
+    """
+    if not len(dates):
+        print("There is no data for these dates.")
+        return
+
+    print(Fore.CYAN + f"{'day':<11} {'confirmed':>10} {f'mean {window}d':>12} {f'growth {window}d':>12} {'doubling':>9}")
+    for date, confirmed, mean, rate, days in zip(dates.astype(str).tolist(), daily.tolist(), means.tolist(), growth.tolist(),
+                                                 doubling.tolist()):
+        print(f"{date:<11} {confirmed:>10} {mean:>12.2f} {rate * 100:>11.2f}% {days:>9.1f}")
+
+
+def show_cache_stats(stats):
+    """
+    Print the statistics of the cache of the relational DB reads
+
+    :param stats: dictionary with the hits, the misses, the evictions, the invalidations and the entries of the cache
+    :return:
+    """
+    reads = stats["hits"] + stats["misses"]
+    hit_rate = stats["hits"] / reads * 100 if reads else 0
+    print(Fore.CYAN + f"Cache: {stats['hits']} hits, {stats['misses']} misses ({hit_rate:.1f}% hits), "
+                      f"{stats['evictions']} evictions, {stats['invalidations']} invalidations, {stats['entries']} entries")
+
+
+def show_script_stats(stats):
+    """
+    Print the statistics of a script run without asking the user (see controller.run_script)
+
+    :param stats: dictionary with the statistics of the script
+    :return:
+    """
+    commands_per_sec = stats["commands"] / stats["seconds"] if stats["seconds"] else 0
+    print(Fore.CYAN + f"\n{stats['commands']} commands in {stats['seconds']:.3f} s -> {commands_per_sec:.0f} commands/s")
+    print(f"Changes: {stats['applied']} applied, {stats['failed']} failed | InfluxDB: {stats['written']} points written, "
+          f"{stats['deleted']} deleted, {stats['round_trips']} round trips | Relational DB: {stats['months']} months written")
+
+
+def show_repair_plan(plan, max_shown=10):
+    """
+    Print what is wrong in the databases (see consistency.verify)
+
+    :param plan: the repair plan; None if the databases could not be checked
+    :param max_shown: maximum number of points and rows printed
+    :return:
+    """
+    if plan is None:
+        print(Fore.RED + "Error! The databases could not be checked.")
+        return
+
+    print(Fore.CYAN + f"{plan['checked_points']} points and {plan['checked_months']} months checked")
+    if not plan["points"] and not plan["rows"] and not plan["deleted_months"]:
+        print("Both databases are consistent!")
+        return
+
+    print(Fore.RED + f"{len(plan['points'])} points with wrong total_* fields, {len(plan['rows'])} months missing or wrong, "
+                     f"{len(plan['deleted_months'])} months without points")
+    for point in plan["points"][:max_shown]:
+        print(f"\tpoint {point['time'][0:10]}: {point['fields']}")
+    for row in plan["rows"][:max_shown]:
+        print(f"\tmonth {row[0]} {row[1]}: {row[2:]}")
+    for year, month in plan["deleted_months"][:max_shown]:
+        print(f"\tmonth {year} {month}: to be deleted")
+
+
+def show_write_queue_status(status):
+    """
+    Print the status of the write-behind queue (see write_queue.py)
+
+    :param status: dictionary with the status of the queue; None if the queue is not enabled
+    :return:
+    """
+    if status is None:
+        print("The write commands are applied immediately (utils.WRITE_BEHIND is disabled).")
+        return
+
+    print(Fore.CYAN + f"Write queue: {status['pending']} commands pending, {status['submitted']} submitted, "
+                      f"{status['batches']} batches applied (last one in {status['last_batch_seconds']:.3f} s)")
+    print(f"Changes: {status['applied']} applied, {status['failed']} failed | InfluxDB: {status['written']} points written, "
+          f"{status['deleted']} deleted | Relational DB: {status['months']} months written")
+    if status["retrying"]:
+        print(Fore.RED + f"{status['retrying']} commands could not be written, they are retried before the next ones "
+                         f"({status['retries']} failed attempts)")
+    if status["last_error"]:
+        print(Fore.RED + f"Last error: {status['last_error']}")
+
+
+def show_round_trips(client):
+    """
+    Print the number of requests done to InfluxDB since the counter was reset (see timeSeriesDB.resources.count_round_trips)
+
+    :param client: the client that connects with InfluxDB
+    :return:
+    """
+    if utils.SHOW_ROUND_TRIPS and hasattr(client, "round_trips"):
+        print(Fore.CYAN + f"InfluxDB round trips: {client.round_trips}")
+
+
 def check_int(n):
     """
     Check if the string value can be converted to integer
@@ -82,7 +261,12 @@ def check_data_format(data_time):
     data_list = data_time.split("-")
     if len(data_list) == 3:
         if len(data_list[0]) == 4 and check_int(data_list[0]) and len(data_list[1]) == 2 and check_int(data_list[1]) and len(data_list[2]) == 2 and check_int(data_list[2]):
-            return True
+            # It must also be a day of the calendar (e.g. not 2021-02-30 or 2021-13-01)
+            try:
+                datetime.strptime(data_time, '%Y-%m-%d')
+                return True
+            except ValueError:
+                pass
     print("Error data format! Please follow this format: YYYY-MM-DD")
     return False
 
@@ -115,6 +299,101 @@ def check_format_update_point(cmd_list):
     return False
 
 
+def check_format_insert_range(cmd_list):
+    """
+    Check command format for inserting the points of many days (insert-range FROM TO confirmed deceased recovered or
+    insert-range FILE)
+
+    :param cmd_list:
+    :return: True if the format is correct; False otherwise
+    """
+    if len(cmd_list) == 2 and cmd_list[0] == "insert-range":
+        return True
+    if len(cmd_list) == 6:
+        if cmd_list[0] == "insert-range" and check_data_format(cmd_list[1]) and check_data_format(cmd_list[2]) and \
+                check_int(cmd_list[3]) and check_int(cmd_list[4]) and check_int(cmd_list[5]):
+            if cmd_list[1] <= cmd_list[2]:
+                return True
+            print("The first date must not be after the last one!")
+    print("Incorrect format!")
+    return False
+
+
+def check_format_daily_row(row_list):
+    """
+    Check the format of a row of a file of daily values (YYYY-MM-DD confirmed deceased recovered)
+
+    :param row_list:
+    :return: True if the format is correct; False otherwise
+    """
+    return len(row_list) == 4 and check_data_format(row_list[0]) and check_int(row_list[1]) and check_int(row_list[2]) and \
+        check_int(row_list[3])
+
+
+def check_format_stats(cmd_list):
+    """
+    Check command format for showing the statistics or the trend of a range of dates (stats FROM TO [window] or
+    trend FROM TO [window])
+
+    :param cmd_list:
+    :return: True if the format is correct; False otherwise
+    """
+    if len(cmd_list) in (3, 4):
+        if cmd_list[0] in ("stats", "trend") and check_data_format(cmd_list[1]) and check_data_format(cmd_list[2]) and \
+                (len(cmd_list) == 3 or (check_int(cmd_list[3]) and int(cmd_list[3]) > 0)):
+            if cmd_list[1] <= cmd_list[2]:
+                return True
+            print("The first date must not be after the last one!")
+    print("Incorrect format!")
+    return False
+
+
+def check_format_export(cmd_list):
+    """
+    Check command format for exporting data (export series FROM TO FILE or export months FILE)
+
+    :param cmd_list:
+    :return: True if the format is correct; False otherwise
+    """
+    if cmd_list[0] == "export" and cmd_list[-1].endswith((".csv", ".jsonl")):
+        if len(cmd_list) == 5 and cmd_list[1] == "series" and check_data_format(cmd_list[2]) and check_data_format(cmd_list[3]):
+            return True
+        if len(cmd_list) == 3 and cmd_list[1] == "months":
+            return True
+    print("Incorrect format! The file must be a .csv or a .jsonl file")
+    return False
+
+
+def check_format_month(cmd_list):
+    """
+    Check command format for showing a month
+
+    :param cmd_list:
+    :return: True if the format is correct; False otherwise
+    """
+    if len(cmd_list) == 2:
+        date_list = cmd_list[1].split("-")
+        if cmd_list[0] == "month" and len(date_list) == 2 and len(date_list[0]) == 4 and check_int(date_list[0]) and \
+                len(date_list[1]) == 2 and check_int(date_list[1]) and 1 <= int(date_list[1]) <= 12:
+            return True
+    print("Incorrect format! Please follow this format: month YYYY-MM")
+    return False
+
+
+def check_format_months(cmd_list):
+    """
+    Check command format for showing the months of a range of years
+
+    :param cmd_list:
+    :return: True if the format is correct; False otherwise
+    """
+    if 1 <= len(cmd_list) <= 3:
+        if cmd_list[0] == "months" and all(len(year) == 4 and check_int(year) for year in cmd_list[1:]):
+            return True
+    print("Incorrect format! Please follow this format: months [first_year [last_year]]")
+    return False
+
+
 def check_format_delete_point(cmd_list):
     """
     Check command format for inserting a point
@@ -271,28 +550,39 @@ def get_num_days_for_month(month_num, year_num):
         return -1
 
 
-def get_previous_point(client, measurement_name, date=None):
+def get_previous_point(client, date=None):
     """
-    Get the previous point where we have data inserted starting from today
+    Get the previous point where we have data inserted starting from today (or from the given date). It is found with a single
+    query over all the months, and the result is kept in the cache so asking again for the same date does not query InfluxDB.
 
     :param client: the client that connects with InfluxDB and allow us to interact with the database
-    :param measurement_name:
-    :param date:
-    :return:
+    :param date: the date (YYYY-MM-DD) of which we want the previous point; today if None
+    :return: the previous point; a point with all the fields to 0 if there is no data before that date
     """
-    previous_point = []
-
     if not date:
         date = get_current_time()
+    date = str(date)[0:10]
 
-    # Get previous day
-    data = get_previous_day(date)
+    if date not in previous_points_cache:
+        previous_points_cache[date] = res_ts.get_last_point_before(client, date)
 
-    while len(previous_point) == 0:
-        previous_point = res_ts.get_point(client, measurement_name, data)
-        data = get_previous_day(data)
+    previous_point = previous_points_cache[date]
+    if previous_point is None:
+        return create_fields_dict(0, 0, 0, 0, 0, 0)
+    return previous_point
 
-    return previous_point[0][0]
+
+def forget_previous_points(date):
+    """
+    Remove from the cache the previous points that might have changed after writing or deleting a point
+
+    :param date: the date (YYYY-MM-DD) of the point written or deleted
+    :return:
+    """
+    date = str(date)[0:10]
+    for cached_date in list(previous_points_cache.keys()):
+        if cached_date > date:
+            del previous_points_cache[cached_date]
 
 
 def create_fields_dict(d_conf, d_dec, d_rec, t_conf, t_dec, t_rec):
@@ -318,71 +608,17 @@ def create_fields_dict(d_conf, d_dec, d_rec, t_conf, t_dec, t_rec):
     return points
 
 
-def recompute_total_fields_next_points(client, date, d_conf, d_dec, d_rec):
-    """
-    Recompute the total_fields for the next points. The total fields are the following ones:
-        total_confirmed
-        total_deceased
-        total_recovered
-
-    :param client: the client that connects with InfluxDB and allow us to interact with the database
-    :param date: from where we will "start" to recompute the data
-    :param d_conf: the confirmed cases to be applied
-    :param d_dec: the deceased cases to be applied
-    :param d_rec: the recovered cases to be applied
-    :return:
+def create_daily_fields_dict(d_conf, d_dec, d_rec):
     """
-    # Get next day
-    next_date = get_next_day(date)
-
-    # Current day + 1
-    today_date = get_next_current_time_format()
-
-    # We will do it till we get to the last point (it is supposed to be the current day)
-    while next_date != today_date:
-
-        # Measurement name update
-        measurement_name = get_month_from_data(next_date)
-
-        # Let's get the next point
-        next_point = res_ts.get_point(client, measurement_name, next_date)
-        print(next_point)
+    Create a dictionary with only the daily fields (with utils.TS_TOTALS = "lazy" the totals are not stored)
 
-        # There might be days that there are no points (you never know)
-        if len(next_point) != 0:
-            next_point = next_point[0][0]
-
-            # Create dictionary with the necessary fields
-            points = create_fields_dict(next_point["dailyconfirmed"], next_point["dailydeceased"], next_point["dailyrecovered"],
-                                        str(int(next_point["totalconfirmed"]) + d_conf),
-                                        str(int(next_point["totaldeceased"]) + d_dec),
-                                        str(int(next_point["totalrecovered"]) + d_rec))
-
-            # Update that point
-            res_ts.update_point(client, measurement_name, points, next_date)
-
-        # Once we finished to update the point for that day, let's get the next one
-        next_date = get_next_day(next_date)
-
-
-def recompute_values_for_month(table, month, days, total_confirmed, total_deceased, total_recovered):
-    """
-    Recompute the values for the specific month in the relational Database
-
-    :param table: table name where the month it is located
-    :param month: the month that we want to recompute the values
-    :param days: number of days (or points)
-    :param total_confirmed: total confirmed cases (value already computed)
-    :param total_deceased: total deceased cases (value already computed)
-    :param total_recovered: total recovered cases (value already computed)
-    :return:
+    :param d_conf: number of confirmed during this day
+    :param d_dec: number of deceased during this day
+    :param d_rec: number of recovered during this day
+    :return: a dictionary with the corresponding fields
     """
-
-    # Update the average values using the new values for that month
-    avg_confirmed = round(total_confirmed / days, 2)
-    avg_deceased = round(total_deceased / days, 2)
-    avg_recovered = round(total_recovered / days, 2)
-
-    # Update the data in the relational database
-    res_rl.update_data(table, month, avg_confirmed, avg_deceased, avg_recovered, total_confirmed,
-                       total_deceased, total_recovered, days)
+    return {
+        "dailyconfirmed": d_conf,
+        "dailydeceased": d_dec,
+        "dailyrecovered": d_rec
+    }
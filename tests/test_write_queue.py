@@ -0,0 +1,108 @@
+"""
+Tests of the write-behind queue (write_queue.py). The databases are replaced by a dictionary with the values of each day, so the
+order in which the commands are applied (and replayed from the journal) can be checked without InfluxDB and PostgreSQL.
+"""
+import os
+import tempfile
+import unittest
+from unittest import mock
+import logic
+import utils
+import write_queue
+
+DAY = "2021-01-01"
+
+
+class FakeDatabases:
+    """
+    Days stored in both databases, written by apply_daily_changes. The first writes can be made to fail.
+    """
+
+    def __init__(self, failures=0):
+        self.days = {}
+        self.failures = failures
+
+    def apply_daily_changes(self, client, changes):
+        if self.failures:
+            self.failures -= 1
+            return {"applied": 0, "failed": 0, "written": 0, "deleted": 0, "months": 0, "error": "connection refused"}
+
+        for date, values, _ in changes:
+            if values is None:
+                self.days.pop(date, None)
+            else:
+                self.days[date] = tuple(values)
+        return {"applied": len(changes), "failed": 0, "written": len(changes), "deleted": 0, "months": 1, "error": None}
+
+
+class WriteBehindQueueTest(unittest.TestCase):
+
+    def setUp(self):
+        self.journal_file = os.path.join(tempfile.mkdtemp(), "journal.jsonl")
+        patcher = mock.patch.object(utils, "WRITE_RETRY_SECONDS", 0.01)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def run_queue(self, databases, commands):
+        """
+        Start a queue (replaying the journal), submit the commands one by one waiting for each of them and close it
+        """
+        with mock.patch.object(logic, "apply_daily_changes", databases.apply_daily_changes):
+            writer = write_queue.WriteBehindQueue(None, journal_file=self.journal_file)
+            writer.flush()
+            for command in commands:
+                self.assertTrue(writer.submit(command))
+                writer.flush()
+            status = writer.get_status()
+            writer.close()
+        return status
+
+    def test_failed_command_is_not_replayed_over_a_newer_one(self):
+        databases = FakeDatabases(failures=1)
+        status = self.run_queue(databases, [f"update 5 5 5 {DAY}", f"update 7 7 7 {DAY}"])
+
+        self.assertEqual(databases.days[DAY], (7, 7, 7))
+        self.assertEqual(status["pending"], 0)
+        self.assertEqual(status["last_error"], "connection refused")
+        self.assertFalse(os.path.exists(self.journal_file))
+
+        # Restart: nothing is replayed, so the day keeps the newest values
+        self.run_queue(databases, [])
+        self.assertEqual(databases.days[DAY], (7, 7, 7))
+
+    def test_commands_that_can_not_be_written_are_replayed_in_order(self):
+        down = FakeDatabases(failures=1000)
+        status = self.run_queue(down, [f"update 5 5 5 {DAY}", f"update 7 7 7 {DAY}"])
+
+        self.assertEqual(status["pending"], 2)
+        self.assertEqual(status["applied"], 0)
+        self.assertEqual(status["failed"], 0)
+        self.assertTrue(os.path.exists(self.journal_file))
+
+        # Restart with the databases back: both commands are replayed in the order they were submitted
+        up = FakeDatabases()
+        self.run_queue(up, [])
+        self.assertEqual(up.days[DAY], (7, 7, 7))
+        self.assertFalse(os.path.exists(self.journal_file))
+
+    def test_worker_survives_a_journal_error(self):
+        databases = FakeDatabases()
+        rewrite_journal = write_queue.WriteBehindQueue.rewrite_journal
+        calls = []
+
+        def failing_rewrite(writer):
+            calls.append(writer)
+            if len(calls) == 1:
+                raise OSError("disk full")
+            rewrite_journal(writer)
+
+        with mock.patch.object(write_queue.WriteBehindQueue, "rewrite_journal", failing_rewrite):
+            status = self.run_queue(databases, [f"update 5 5 5 {DAY}", f"update 7 7 7 {DAY}"])
+
+        self.assertEqual(databases.days[DAY], (7, 7, 7))
+        self.assertEqual(status["pending"], 0)
+        self.assertEqual(status["last_error"], "disk full")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -6,41 +6,63 @@ This file will create a new database into InfluxDB and will insert a json body w
 import os
 from influxdb import InfluxDBClient
 from timeSeriesDB import resources as res
+from timeSeriesDB import ingest
 import utils
 
 
-# Get path of the Json directory
-dir_path = os.path.dirname(os.path.realpath(__file__)).replace('timeSeriesDB', '/data')
+def main():
+    """
+    Create the database and load all the json files of the data directory
+    :return:
+    """
+    # Get path of the Json directory
+    dir_path = os.path.dirname(os.path.realpath(__file__)).replace('timeSeriesDB', '/data')
 
-# Get all json files from the directory
-json_files = [dir_path + f'/{f}' for f in os.listdir(dir_path)]
+    # Get all json files from the directory
+    json_files = [dir_path + f'/{f}' for f in sorted(os.listdir(dir_path)) if f.endswith(".json")]
 
+    # Create new client to connect with InfluxDB
+    try:
+        client = InfluxDBClient(host=utils.TS_HOST, port=utils.TS_PORT, gzip=utils.TS_GZIP)
+    except Exception as e:
+        print(e)
+    else:
+        # Create a new database
+        res.create_new_database(client, utils.TS_DB_NAME)
 
-# Create new client to connect with InfluxDB
-try:
-    client = InfluxDBClient(host="localhost", port=8086)
-except Exception as e:
-    print(e)
-else:
-    # Create a new database
-    res.create_new_database(client, utils.TS_DB_NAME)
+        # Show databases
+        res.show_databases(client)
 
-    # Show databases
-    res.show_databases(client)
+        # Select database
+        res.select_database(client, utils.TS_DB_NAME)
 
-    # Select database
-    res.select_database(client, utils.TS_DB_NAME)
+        # If the database is empty (e.g. it has just been created) the watermarks of the previous loads are not valid
+        incremental = utils.TS_LOAD_MODE == "incremental" and len(client.get_list_measurements()) > 0
 
-    # Empty database if it was already filled
-    for month in utils.MONTHS:
-        res.drop_measurement(client, month)
+        if incremental:
+            # Only the new or changed days will be written, so there is nothing to drop
+            watermarks = ingest.load_watermarks()
+        else:
+            # Empty database if it was already filled
+            for measurement in utils.MONTHS + [utils.TS_MEASUREMENT, utils.STATEWISE_MEASUREMENT, utils.TESTED_MEASUREMENT]:
+                res.drop_measurement(client, measurement)
 
-    # Check that it is empty
-    res.show_measurements(client)
+            # Check that it is empty
+            res.show_measurements(client)
 
-    # Insert all json files
-    for file in json_files:
-        res.create_and_write_json(client, file)
+            watermarks = {}
 
-    # Check that the measurements have been created successfully
-    res.show_measurements(client)
+        # Insert all json files (in parallel, each worker has its own client)
+        summary = ingest.ingest_files(json_files, watermarks=watermarks if incremental else None)
+
+        # Save the state of this load, so the next one can be incremental (the files that failed keep the old one)
+        watermarks.update(summary["watermarks"])
+        ingest.save_watermarks(watermarks)
+
+        # Check that the measurements have been created successfully
+        res.show_measurements(client)
+
+
+# The pool of processes imports this file again in each worker, so the load can not be done at import time
+if __name__ == '__main__':
+    main()
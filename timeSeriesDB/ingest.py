@@ -0,0 +1,251 @@
+"""
+This file will contain the logic to load several json files into InfluxDB in parallel. Each worker (thread or process) has its
+own client, and a file that fails does not stop the load of the others.
+
+The files can also be loaded incrementally. For each file we keep a watermark with the checksum of its content, the last day
+(dateymd) loaded and a digest of each record. If the checksum has not changed the file is skipped, otherwise only the records which
+are new or whose digest has changed are written, so a daily refresh costs O(new days) and nothing has to be dropped.
+"""
+import os
+import json
+import hashlib
+import threading
+from time import perf_counter
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from influxdb import InfluxDBClient
+from timeSeriesDB import resources as res
+from timeSeriesDB import json_reader
+import utils
+
+# Data of the current worker (its client)
+worker_data = threading.local()
+
+
+def get_worker_client():
+    """
+    Get the client of the current worker, creating it the first time
+
+    :return: the client that connects with InfluxDB, with the time series database already selected
+    """
+    if not hasattr(worker_data, "client"):
+        worker_data.client = InfluxDBClient(host=utils.TS_HOST, port=utils.TS_PORT, database=utils.TS_DB_NAME, gzip=utils.TS_GZIP)
+    return worker_data.client
+
+
+def ingest_file(json_file, batch_size=utils.TS_BATCH_SIZE, watermark=None):
+    """
+    Load a json file into InfluxDB using the client of the current worker. Any error is caught and returned, so it only
+    affects this file.
+
+    :param json_file: the json file to be loaded
+    :param batch_size: maximum number of points sent in each request
+    :param watermark: None to write all the days; the watermark of the last load of the file (or {} if it was never loaded)
+    to write only the days that are new or have changed
+    :return: a dictionary with the result of the load: file, points, failed, batches, flush_seconds, max_flush_seconds (see
+    write_points_in_batches), seconds, error (None if everything went fine), skipped (True if the file has not changed) and
+    watermark (the new watermark, None if it can not be saved)
+    """
+    result = {"file": json_file, "points": 0, "failed": 0, "batches": 0, "flush_seconds": 0.0, "max_flush_seconds": 0.0,
+              "seconds": 0.0, "error": None, "skipped": False, "watermark": None}
+    start = perf_counter()
+
+    try:
+        new_watermark = {"checksum": get_file_checksum(json_file), "last_dateymd": None, "days": {}}
+
+        if watermark is not None and watermark.get("checksum") == new_watermark["checksum"]:
+            result["skipped"] = True
+            result["watermark"] = watermark
+        else:
+            if watermark is None:
+                points = read_points_and_watermark(json_file, new_watermark)
+            else:
+                points = read_changed_points(json_file, watermark, new_watermark)
+
+            stats = res.write_points_in_batches(get_worker_client(), points, batch_size)
+            for key in ("points", "failed", "batches", "flush_seconds", "max_flush_seconds"):
+                result[key] = stats[key]
+
+            # If some points could not be written, the next load has to try them again
+            if not stats["failed"]:
+                result["watermark"] = new_watermark
+    except Exception as e:
+        result["error"] = str(e)
+
+    result["seconds"] = perf_counter() - start
+    return result
+
+
+def ingest_files(json_files, workers=utils.TS_INGEST_WORKERS, use_processes=utils.TS_INGEST_PROCESSES,
+                 batch_size=utils.TS_BATCH_SIZE, watermarks=None):
+    """
+    Load all the json files into InfluxDB in parallel, showing the progress file by file and a summary at the end
+
+    :param json_files: list of json files to be loaded
+    :param workers: number of workers (None -> one per core)
+    :param use_processes: True to use a pool of processes (parsing the files scales with the cores); False to use threads
+    :param batch_size: maximum number of points sent in each request
+    :param watermarks: None to write all the days of every file; a dictionary with the watermark of each file (key = file name)
+    to load them incrementally
+    :return: a dictionary with the summary: files, points, failed, batches, flush_seconds, max_flush_seconds, skipped, errors
+    (list of results with error), seconds and watermarks (the new watermark of each file that has been loaded without errors)
+    """
+    summary = {"files": len(json_files), "points": 0, "failed": 0, "batches": 0, "flush_seconds": 0.0, "max_flush_seconds": 0.0,
+               "skipped": 0, "errors": [], "seconds": 0.0, "watermarks": {}}
+    start = perf_counter()
+
+    executor_class = ProcessPoolExecutor if use_processes else ThreadPoolExecutor
+    with executor_class(max_workers=workers) as executor:
+        futures = []
+        for json_file in json_files:
+            watermark = None if watermarks is None else watermarks.get(os.path.basename(json_file), {})
+            futures.append(executor.submit(ingest_file, json_file, batch_size, watermark))
+
+        for done, future in enumerate(as_completed(futures), 1):
+            result = future.result()
+            for key in ("points", "failed", "batches", "flush_seconds"):
+                summary[key] += result[key]
+            summary["max_flush_seconds"] = max(summary["max_flush_seconds"], result["max_flush_seconds"])
+
+            if result["error"]:
+                summary["errors"].append(result)
+                print(f"[{done}/{len(json_files)}] {result['file']}: ERROR {result['error']}")
+            elif result["skipped"]:
+                summary["skipped"] += 1
+                print(f"[{done}/{len(json_files)}] {result['file']}: not changed since the last load")
+            else:
+                res.show_load_stats(f"[{done}/{len(json_files)}] {result['file']}", result)
+
+            if result["watermark"]:
+                summary["watermarks"][os.path.basename(result["file"])] = result["watermark"]
+
+    summary["seconds"] = perf_counter() - start
+    show_summary(summary)
+    return summary
+
+
+def show_summary(summary):
+    """
+    Print the summary of a parallel load
+
+    :param summary: dictionary returned by ingest_files
+    :return:
+    """
+    points_per_sec = summary["points"] / summary["seconds"] if summary["seconds"] else 0
+    avg_flush = summary["flush_seconds"] / summary["batches"] if summary["batches"] else 0
+    print(f"\nLoaded {summary['files'] - len(summary['errors'])}/{summary['files']} files ({summary['skipped']} not changed): "
+          f"{summary['points']} points written ({summary['failed']} failed) in {summary['seconds']:.3f} s "
+          f"-> {points_per_sec:.0f} points/s | {summary['batches']} batches, flush latency avg {avg_flush * 1000:.1f} ms, "
+          f"max {summary['max_flush_seconds'] * 1000:.1f} ms")
+    for result in summary["errors"]:
+        print(f"\t{result['file']}: {result['error']}")
+
+
+def read_points_and_watermark(json_file, new_watermark):
+    """
+    Stream all the records of the json file as points, filling the new watermark of the file
+
+    :param json_file: the json file where we extract the data
+    :param new_watermark: the watermark that will be filled while the file is read
+    :return: a generator of points in json protocol
+    """
+    for section, record in json_reader.read_sections(json_file, utils.TS_SECTIONS):
+        add_record_to_watermark(new_watermark, section, record)
+        point = res.POINT_CREATORS[section](record)
+        if point:
+            yield point
+
+
+def read_changed_points(json_file, watermark, new_watermark):
+    """
+    Stream only the records of the json file that are after the last day loaded or that have changed since the last load
+
+    :param json_file: the json file where we extract the data
+    :param watermark: the watermark of the last load of the file
+    :param new_watermark: the watermark that will be filled while the file is read
+    :return: a generator of points in json protocol
+    """
+    last_dateymd = watermark.get("last_dateymd") or ""
+    days = watermark.get("days", {})
+
+    for section, record in json_reader.read_sections(json_file, utils.TS_SECTIONS):
+        key, digest = add_record_to_watermark(new_watermark, section, record)
+        is_new_day = section == "cases_time_series" and record["dateymd"] > last_dateymd
+
+        if is_new_day or days.get(key) != digest:
+            point = res.POINT_CREATORS[section](record)
+            if point:
+                yield point
+
+
+def add_record_to_watermark(watermark, section, record):
+    """
+    Add a record of the json file to the watermark of the file. The days are identified by their date, the states by their
+    code and the tests by the time they were reported.
+
+    :param watermark: the watermark being built
+    :param section: the section of the json file where the record is
+    :param record: dictionary with the data of the record
+    :return: a tuple with the key and the digest of the record
+    """
+    if section == "cases_time_series":
+        key = record["dateymd"]
+        if not watermark["last_dateymd"] or key > watermark["last_dateymd"]:
+            watermark["last_dateymd"] = key
+    elif section == "statewise":
+        key = f"{section}/{record['statecode']}"
+    else:
+        key = f"{section}/{record.get('updatetimestamp')}"
+
+    digest = hashlib.sha1(json.dumps(record, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+    watermark["days"][key] = digest
+    return key, digest
+
+
+def get_file_checksum(json_file):
+    """
+    Compute the checksum of a file (reading it in blocks)
+
+    :param json_file: the file
+    :return: the sha256 of the content of the file
+    """
+    checksum = hashlib.sha256()
+    with open(json_file, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            checksum.update(block)
+    return checksum.hexdigest()
+
+
+def get_watermark_path():
+    """
+    :return: the path of the file where the watermarks are saved (in the root of the project)
+    """
+    return os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(__file__))), utils.TS_WATERMARK_FILE)
+
+
+def load_watermarks():
+    """
+    Load the watermarks of the last load
+
+    :return: a dictionary with the watermark of each json file (empty if the files were never loaded incrementally)
+    """
+    try:
+        with open(get_watermark_path()) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except Exception as e:
+        print(e)
+        return {}
+
+
+def save_watermarks(watermarks):
+    """
+    Save the watermarks. The file is replaced atomically, so it is never left half written.
+
+    :param watermarks: a dictionary with the watermark of each json file
+    :return:
+    """
+    path = get_watermark_path()
+    with open(path + ".tmp", "w") as f:
+        json.dump(watermarks, f)
+    os.replace(path + ".tmp", path)
@@ -0,0 +1,190 @@
+"""
+This file will contain a streaming reader for the json files of the data directory. Instead of loading the whole file with
+json.load, the file is read in chunks and the records of the selected top-level sections are yielded one by one, so the memory
+used does not depend on the size of the file (only on the size of a chunk and of a single record).
+"""
+import json
+import utils
+
+# Used to decode a single json value from the buffer
+decoder = json.JSONDecoder()
+
+WHITESPACE = " \t\n\r"
+
+# Characters that can continue a number
+NUMBER_CHARS = "0123456789.eE+-"
+
+
+def read_sections(json_file, sections=("cases_time_series",), chunk_size=utils.JSON_CHUNK_SIZE):
+    """
+    Read a json file whose top level is an object of sections (like india_covid.json) and yield the records of the selected
+    sections. If a section is a list, each element is a record; otherwise the whole value is yielded as a single record.
+    The sections that are not selected are skipped without keeping them in memory.
+
+    :param json_file: the json file where we extract the data
+    :param sections: the names of the top-level sections to project; None to read all of them
+    :param chunk_size: number of characters read from the file each time
+    :return: a generator of tuples (section name, record)
+    """
+    with open(json_file) as json_f:
+        stream = JsonStream(json_f, chunk_size)
+
+        stream.expect("{")
+        if stream.peek() == "}":
+            return
+
+        while True:
+            section = stream.decode_value()
+            stream.expect(":")
+
+            if sections is None or section in sections:
+                for record in stream.iter_value():
+                    yield section, record
+            else:
+                # Skip the section (record by record, so it is never fully in memory)
+                for _ in stream.iter_value():
+                    pass
+
+            # Either there is another section or we have finished
+            if stream.next_char() == "}":
+                return
+            stream.back()
+            stream.expect(",")
+
+
+def read_cases_time_series(json_file, chunk_size=utils.JSON_CHUNK_SIZE):
+    """
+    Yield the days of the "cases_time_series" section one by one
+
+    :param json_file: the json file where we extract the data
+    :param chunk_size: number of characters read from the file each time
+    :return: a generator of dictionaries, one per day
+    """
+    for _, day in read_sections(json_file, ("cases_time_series",), chunk_size):
+        yield day
+
+
+class JsonStream:
+    """
+    Buffer over an open json file which allows to decode the values one by one. Only the part of the file which has not been
+    decoded yet is kept in memory.
+    """
+
+    def __init__(self, json_f, chunk_size):
+        self.json_f = json_f
+        self.chunk_size = chunk_size
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+
+    def read_chunk(self):
+        """
+        Read the next chunk of the file and append it to the buffer, discarding the part already decoded
+
+        :return: False if the end of the file has been reached; True otherwise
+        """
+        if self.eof:
+            return False
+
+        chunk = self.json_f.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def skip_whitespace(self):
+        """
+        Move the position to the next character which is not a whitespace (reading more chunks if needed)
+
+        :return:
+        """
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buffer) or not self.read_chunk():
+                return
+
+    def peek(self):
+        """
+        :return: the next character which is not a whitespace, without consuming it
+        """
+        self.skip_whitespace()
+        if self.pos >= len(self.buffer):
+            raise ValueError("Unexpected end of the json file")
+        return self.buffer[self.pos]
+
+    def next_char(self):
+        """
+        :return: the next character which is not a whitespace (consuming it)
+        """
+        char = self.peek()
+        self.pos += 1
+        return char
+
+    def back(self):
+        """
+        Undo the last next_char
+
+        :return:
+        """
+        self.pos -= 1
+
+    def expect(self, char):
+        """
+        Consume the next character which is not a whitespace and check that it is the expected one
+
+        :param char: the expected character
+        :return:
+        """
+        found = self.next_char()
+        if found != char:
+            raise ValueError(f"Malformed json file: expected '{char}' but found '{found}'")
+
+    def decode_value(self):
+        """
+        Decode the next json value of the buffer
+
+        :return: the value decoded
+        """
+        self.skip_whitespace()
+        while True:
+            try:
+                value, end = decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                # The value might be cut by the end of the chunk
+                if not self.read_chunk():
+                    raise
+                continue
+
+            # A number at the end of the buffer might continue in the next chunk (e.g. "12" of "12.5")
+            if isinstance(value, (int, float)) and not self.buffer[end:].lstrip(NUMBER_CHARS) and self.read_chunk():
+                continue
+
+            self.pos = end
+            return value
+
+    def iter_value(self):
+        """
+        Yield the elements of the next value if it is a list; otherwise yield the value itself
+
+        :return: a generator of values
+        """
+        if self.peek() != "[":
+            yield self.decode_value()
+            return
+
+        self.expect("[")
+        if self.peek() == "]":
+            self.pos += 1
+            return
+
+        while True:
+            yield self.decode_value()
+            char = self.next_char()
+            if char == "]":
+                return
+            if char != ",":
+                raise ValueError(f"Malformed json file: expected ',' or ']' but found '{char}'")
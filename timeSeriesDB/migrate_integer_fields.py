@@ -0,0 +1,81 @@
+"""
+RUN THIS FILE ONCE TO MIGRATE A TIME SERIES DATABASE THAT WAS FILLED WITH STRING FIELDS
+
+The first versions of the project stored every field as a string ("dailyconfirmed": "1"). InfluxDB can not change the type of a
+field, so each month measurement is read, copied to a backup measurement, dropped and written again with integer fields. The
+backup is only dropped if all the points could be written again.
+"""
+from influxdb import InfluxDBClient
+from timeSeriesDB import resources as res
+import utils
+
+# Fields of the cases_time_series points
+FIELDS = ["dailyconfirmed", "dailydeceased", "dailyrecovered", "totalconfirmed", "totaldeceased", "totalrecovered"]
+
+
+def migrate_measurement(client, measurement):
+    """
+    Rewrite a measurement with integer fields
+
+    :param client: the client that connects with InfluxDB and allow us to interact with the database
+    :param measurement: the name of the measurement
+    :return: True if the measurement has been migrated (or did not need it); False otherwise
+    """
+    points = list(client.query(f'SELECT * FROM "{measurement}"').get_points())
+    if not points or all(isinstance(points[0][field], int) for field in FIELDS):
+        print(f"Measurement {measurement}: nothing to migrate")
+        return True
+
+    backup = f"{measurement}_backup"
+
+    # Keep a copy of the points as they are now, in case something goes wrong
+    stats = res.write_points_in_batches(client, (create_point(backup, point, str) for point in points))
+    if stats["failed"]:
+        print(f"Measurement {measurement}: could not create the backup, nothing has been changed")
+        return False
+
+    res.drop_measurement(client, measurement)
+
+    stats = res.write_points_in_batches(client, (create_point(measurement, point, int) for point in points))
+    res.show_load_stats(measurement, stats)
+    if stats["failed"]:
+        print(f"Measurement {measurement}: some points could not be written, the original points are in {backup}")
+        return False
+
+    res.drop_measurement(client, backup)
+    return True
+
+
+def create_point(measurement, point, field_type):
+    """
+    Create a point (in json protocol) from a point returned by a query
+
+    :param measurement: the measurement where the point will be written
+    :param point: the point returned by the query
+    :param field_type: the type of the fields (int or str)
+    :return: the point in json protocol
+    """
+    return {
+        "measurement": measurement,
+        "tags": {},
+        "time": point["time"],
+        "fields": {field: field_type(point[field]) for field in FIELDS if point.get(field) is not None}
+    }
+
+
+def main():
+    """
+    Migrate all the month measurements
+    :return:
+    """
+    try:
+        client = InfluxDBClient(host=utils.TS_HOST, port=utils.TS_PORT, database=utils.TS_DB_NAME)
+    except Exception as e:
+        print(e)
+    else:
+        migrated = [migrate_measurement(client, month) for month in utils.MONTHS]
+        print(f"\n{sum(migrated)}/{len(migrated)} measurements migrated")
+
+
+if __name__ == '__main__':
+    main()
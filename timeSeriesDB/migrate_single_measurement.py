@@ -0,0 +1,70 @@
+"""
+RUN THIS FILE ONCE TO MOVE A TIME SERIES DATABASE FROM THE "monthly" SCHEMA TO THE "single" SCHEMA
+
+With the "monthly" schema each day is stored in the measurement of its month name, so May 2020 and May 2021 share a measurement
+and reading a range of dates means reading twelve measurements. This file copies all the days to utils.TS_MEASUREMENT (with the
+year and the month as tags if utils.TS_YEAR_MONTH_TAGS) and drops the month measurements once they have been copied.
+
+Set utils.TS_SCHEMA = "single" after running it.
+"""
+from influxdb import InfluxDBClient
+from timeSeriesDB import resources as res
+import utils
+
+
+def migrate_month(client, month):
+    """
+    Copy all the days of a month measurement to the single measurement
+
+    :param client: the client that connects with InfluxDB and allow us to interact with the database
+    :param month: the name of the month measurement
+    :return: the statistics of the load (see timeSeriesDB.resources.write_points_in_batches)
+    """
+    points = client.query(f'SELECT * FROM "{month}"').get_points()
+
+    stats = res.write_points_in_batches(client, (create_point(point) for point in points))
+    res.show_load_stats(month, stats)
+    return stats
+
+
+def create_point(point):
+    """
+    Create a point (in json protocol) of the single measurement from a point returned by a query
+
+    :param point: the point returned by the query
+    :return: the point in json protocol
+    """
+    year_month = {"year": point["time"][0:4], "month": utils.MONTHS[int(point["time"][5:7]) - 1]}
+
+    return {
+        "measurement": utils.TS_MEASUREMENT,
+        "tags": year_month if utils.TS_YEAR_MONTH_TAGS else {},
+        "time": point["time"],
+        "fields": {field: value for field, value in point.items() if field != "time" and value is not None}
+    }
+
+
+def main():
+    """
+    Copy all the month measurements and drop them if everything went fine
+    :return:
+    """
+    try:
+        client = InfluxDBClient(host=utils.TS_HOST, port=utils.TS_PORT, database=utils.TS_DB_NAME)
+    except Exception as e:
+        print(e)
+    else:
+        failed = sum(migrate_month(client, month)["failed"] for month in utils.MONTHS)
+
+        if failed:
+            print(f"\n{failed} points could not be copied, the month measurements have not been dropped")
+            return
+
+        for month in utils.MONTHS:
+            res.drop_measurement(client, month)
+
+        print(f"\nAll the days are now in the measurement {utils.TS_MEASUREMENT}, set utils.TS_SCHEMA = \"single\"")
+
+
+if __name__ == '__main__':
+    main()
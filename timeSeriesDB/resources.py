@@ -3,6 +3,10 @@ This file will contain all the functions which will allow us to interact with In
 """
 import json
 from datetime import datetime
+from time import perf_counter
+from influxdb.line_protocol import make_lines
+from timeSeriesDB import json_reader
+import utils
 
 
 def create_new_database(client, db_name):
@@ -48,53 +52,6 @@ def select_database(client, db_name):
         print(e)
 
 
-def insert_point(client, measurement_name, points):
-    """
-    Insert points to our database by passing a list of points.
-
-    :param client: the client that connects with InfluxDB
-    :param measurement_name: the measurement name where we want to insert the point
-    :param points:
-    :return:
-    """
-    # Create a new json body with only the necessary data extracted and in the correct format
-    new_json_body = [
-        {
-            "measurement": measurement_name,
-            "tags": {},
-            "time": get_current_time(),  # Since we want 00:00:00
-            "fields": points
-        }
-    ]
-
-    # Write the points to the database
-    insert_json(client, new_json_body)
-
-
-def update_point(client, measurement_name, points, time):
-    """
-    Update the value of a specific point from a specific measurement
-
-    :param client: the client that connects with InfluxDB
-    :param measurement_name: the measurement name where we want to update the point
-    :param points:
-    :param time:
-    :return:
-    """
-    # Create a new json body with only the necessary data extracted and in the correct format
-    new_json_body = [
-        {
-            "measurement": measurement_name,
-            "tags": {},
-            "time": str(time),
-            "fields": points
-        }
-    ]
-
-    # Write the points to the database
-    insert_json(client, new_json_body)
-
-
 def drop_database(client, db_name):
     """
     Delete a database from InfluxDB
@@ -125,21 +82,6 @@ def drop_measurement(client, measurement_name):
         print(e)
 
 
-def delete_data(client, measurement_name, time):
-    """
-    Delete a data from the selected database with a specific time
-
-    :param client: the client that connects with InfluxDB
-    :param measurement_name: the measurement name
-    :param time: Time of the data we want to delete
-    :return:
-    """
-    try:
-        client.query(f"DELETE FROM {measurement_name} WHERE (time='{time}');")
-    except Exception as e:
-        print(e)
-
-
 def show_measurements(client):
     """
     Show all measurements of a specific database (must be selected)
@@ -160,25 +102,42 @@ def insert_json(client, json_body):
     :param client: the client that connects with InfluxDB and allow us to interact with the database
     :param json_body: the json that will contain all the data that we will insert in our database
     :return:
+    :raises Exception: if the points could not be written
     """
-
-    try:
-        client.write_points(json_body)
-    except Exception as e:
-        print(str(e))
+    if not client.write_points(json_body):
+        raise RuntimeError("The points could not be written to InfluxDB")
 
 
-def get_month_data_time_series(client, month):
+def create_point_from_day(day):
     """
-    Return a list of all the data we have saved in our influxDB for a certain month
+    Create a point (in json protocol) from a day of the "cases_time_series" section of the json file
 
-    :param client: the client that connects with InfluxDB and allow us to interact with the database
-    :param month: the month for which we want the data
-    :return: a list of all data we got for the specific month
+    :param day: dictionary with the data of a single day
+    :return: the point with only the necessary data extracted and in the correct format
     """
-
-    # For default it puts a list into another list, like this [[data]], so we return just [data]
-    return list(client.query(f"SELECT * FROM {month}"))[0]
+    # Get data from dictionary
+    measurement = get_measurement(day["dateymd"])
+    time = datetime.strptime(day["dateymd"], '%Y-%m-%d')
+    fields = {
+        "dailyconfirmed": int(day["dailyconfirmed"]),
+        "dailydeceased": int(day["dailydeceased"]),
+        "dailyrecovered": int(day["dailyrecovered"]),
+        "totalconfirmed": int(day["totalconfirmed"]),
+        "totaldeceased": int(day["totaldeceased"]),
+        "totalrecovered": int(day["totalrecovered"])
+    }
+
+    # The totals are computed when they are read
+    if utils.TS_TOTALS == "lazy":
+        for field in utils.TOTAL_FIELDS:
+            del fields[field]
+
+    return {
+        "measurement": measurement,
+        "tags": get_tags(time),
+        "time": str(time),
+        "fields": fields
+    }
 
 
 def create_and_write_json(client, json_file):
@@ -186,6 +145,8 @@ def create_and_write_json(client, json_file):
     Read the given json file and extract only the necessary information in order to create a new json body with the correct format
     so it can be passed to a function which will write all the points in the database.
 
+    Note: this writes the points one by one (one request per day). Use bulk_write_json to load a whole file.
+
     :param client: the client that connects with InfluxDB and allow us to interact with the database
     :param json_file: the json file where we extract the data
     :return:
@@ -196,44 +157,481 @@ def create_and_write_json(client, json_file):
 
         # Each day will be a point
         for day in list_data:
-            # Get data from dictionary
-            measurement = day["date"].split()[1]
-            time = datetime.strptime(day["dateymd"], '%Y-%m-%d')
-            fields = {
-                "dailyconfirmed": day["dailyconfirmed"],
-                "dailydeceased": day["dailydeceased"],
-                "dailyrecovered": day["dailyrecovered"],
-                "totalconfirmed": day["totalconfirmed"],
-                "totaldeceased": day["totaldeceased"],
-                "totalrecovered": day["totalrecovered"]
-            }
-
             # Create a new json body with only the necessary data extracted and in the correct format
-            new_json_body = [
-                {
-                    "measurement": measurement,
-                    "tags": {},
-                    "time": str(time),
-                    "fields": fields
-                }
-            ]
+            new_json_body = [create_point_from_day(day)]
 
             # Write the points to the database
             insert_json(client, new_json_body)
 
 
-def get_point(client, month, time):
+def create_point_from_state(state):
+    """
+    Create a point (in json protocol) from a row of the "statewise" section of the json file. The state code and the state name
+    are tags, so the points of a state can be got with an indexed lookup (see get_state_points).
+
+    :param state: dictionary with the data of a single state
+    :return: the point in the correct format; None if it does not have any value
+    """
+    fields = get_int_fields(state, utils.STATEWISE_FIELDS)
+    if not fields:
+        return None
+
+    return {
+        "measurement": utils.STATEWISE_MEASUREMENT,
+        "tags": {"statecode": state["statecode"], "state": state["state"]},
+        "time": str(datetime.strptime(state["lastupdatedtime"], '%d/%m/%Y %H:%M:%S')),
+        "fields": fields
+    }
+
+
+def create_point_from_test(test):
+    """
+    Create a point (in json protocol) from a row of the "tested" section of the json file
+
+    :param test: dictionary with the tests reported at a specific time
+    :return: the point in the correct format; None if it does not have any value
+    """
+    # The text fields (sources and dates) are not stored
+    names = [name for name in test if not name.startswith("source") and name not in ("testedasof", "updatetimestamp")]
+    fields = get_int_fields(test, names)
+    if not fields:
+        return None
+
+    return {
+        "measurement": utils.TESTED_MEASUREMENT,
+        "tags": {},
+        "time": str(datetime.strptime(test["updatetimestamp"], '%d/%m/%Y %H:%M:%S')),
+        "fields": fields
+    }
+
+
+def get_int_fields(data, names):
+    """
+    Get the given fields of a row of the json file as integers. The values are strings, they might have thousands separators
+    ("15,583") and the empty ones are skipped.
+
+    :param data: dictionary with the row of the json file
+    :param names: the names of the fields
+    :return: a dictionary with the fields that have a numeric value
+    """
+    fields = {}
+    for name in names:
+        value = data.get(name, "").replace(",", "").strip()
+        if value.lstrip("-").isdigit():
+            fields[name] = int(value)
+    return fields
+
+
+# Function that converts a record of each section of the json file into a point
+POINT_CREATORS = {
+    "cases_time_series": create_point_from_day,
+    "statewise": create_point_from_state,
+    "tested": create_point_from_test
+}
+
+
+def bulk_write_json(client, json_file, batch_size=utils.TS_BATCH_SIZE, sections=utils.TS_SECTIONS):
+    """
+    Read the given json file and write all the records of the selected sections to the database in batches, instead of doing
+    one request per day. The file is streamed, so the records are written while it is being read and it is never fully loaded
+    in memory.
+
+    :param client: the client that connects with InfluxDB and allow us to interact with the database
+    :param json_file: the json file where we extract the data
+    :param batch_size: maximum number of points sent in each request
+    :param sections: the sections of the json file to be loaded (see POINT_CREATORS)
+    :return: a dictionary with the statistics of the load (see write_points_in_batches)
+    """
+    stats = write_points_in_batches(client, read_points_from_json(json_file, sections), batch_size)
+    show_load_stats(json_file, stats)
+    return stats
+
+
+def read_points_from_json(json_file, sections=utils.TS_SECTIONS):
+    """
+    Stream the records of the selected sections of the given json file as points
+
+    :param json_file: the json file where we extract the data
+    :param sections: the sections of the json file to be read (see POINT_CREATORS)
+    :return: a generator of points in json protocol
+    """
+    for section, record in json_reader.read_sections(json_file, sections):
+        point = POINT_CREATORS[section](record)
+        if point:
+            yield point
+
+
+def write_points_in_batches(client, points, batch_size=utils.TS_BATCH_SIZE):
     """
-    Get a point from the database by making a query.
+    Write points to InfluxDB buffering them and flushing them in batches. Each point is converted to the line protocol when it
+    is buffered, so every flush is a single request with the lines already joined (and gzipped if the client was created with
+    gzip=True).
 
     :param client: the client that connects with InfluxDB and allow us to interact with the database
-    :param month: the measurement name where the point is allocated
-    :param time: the time is what differs us a point from others in the measurement
+    :param points: any iterable of points in json protocol (it can be a generator, it is consumed only once)
+    :param batch_size: maximum number of points sent in each request
+    :return: a dictionary with the statistics of the load:
+        points -> number of points written
+        batches -> number of requests done
+        failed -> number of points that could not be written
+        seconds -> total time of the load
+        flush_seconds -> time spent waiting for InfluxDB
+        max_flush_seconds -> slowest request
+    """
+    stats = {"points": 0, "batches": 0, "failed": 0, "seconds": 0.0, "flush_seconds": 0.0, "max_flush_seconds": 0.0}
+    start = perf_counter()
+
+    buffer = []
+    for point in points:
+        buffer.append(make_lines({"points": [point]}).rstrip("\n"))
+
+        if len(buffer) >= batch_size:
+            flush_lines(client, buffer, stats)
+            buffer = []
+
+    # Last batch (it will be smaller than the batch size)
+    if buffer:
+        flush_lines(client, buffer, stats)
+
+    stats["seconds"] = perf_counter() - start
+    return stats
+
+
+def flush_lines(client, lines, stats):
+    """
+    Write a batch of lines (line protocol) to the database in a single request and update the statistics of the load
+
+    :param client: the client that connects with InfluxDB and allow us to interact with the database
+    :param lines: list of points already converted to the line protocol
+    :param stats: dictionary with the statistics of the load (see write_points_in_batches)
     :return:
     """
-    print(month)
-    print(time)
-    return list(client.query(f"SELECT * FROM {month} WHERE (time='{time}');"))
+    start = perf_counter()
+    try:
+        client.write_points(lines, protocol="line")
+        stats["points"] += len(lines)
+    except Exception as e:
+        stats["failed"] += len(lines)
+        print(str(e))
+    latency = perf_counter() - start
+
+    stats["batches"] += 1
+    stats["flush_seconds"] += latency
+    stats["max_flush_seconds"] = max(stats["max_flush_seconds"], latency)
+
+
+def show_load_stats(name, stats):
+    """
+    Print the statistics of a load
+
+    :param name: what has been loaded (e.g. the json file)
+    :param stats: dictionary with the statistics of the load (see write_points_in_batches)
+    :return:
+    """
+    points_per_sec = stats["points"] / stats["seconds"] if stats["seconds"] else 0
+    avg_flush = stats["flush_seconds"] / stats["batches"] if stats["batches"] else 0
+    print(f"{name}: {stats['points']} points written ({stats['failed']} failed) in {stats['seconds']:.3f} s "
+          f"-> {points_per_sec:.0f} points/s | {stats['batches']} batches, flush latency avg {avg_flush * 1000:.1f} ms, "
+          f"max {stats['max_flush_seconds'] * 1000:.1f} ms")
+
+
+def get_points_after(client, time, included=False):
+    """
+    Get all the points stored after a specific time, from all the month measurements, with a single query
+
+    :param client: the client that connects with InfluxDB and allow us to interact with the database
+    :param time: the points after this time will be returned
+    :param included: True to return also the point of that time
+    :return: a list of tuples (measurement name, point) sorted by time
+    """
+    operator = ">=" if included else ">"
+    result = client.query(f"SELECT * FROM {get_series_source()} WHERE time {operator} '{time}'")
+
+    points = []
+    for (measurement, _), measurement_points in result.items():
+        points.extend((measurement, point) for point in measurement_points)
+    return sorted(points, key=lambda measurement_point: measurement_point[1]["time"])
+
+
+def delete_points(client, measurement_times):
+    """
+    Delete several points with a single request (all the DELETE statements are sent together)
+
+    :param client: the client that connects with InfluxDB and allow us to interact with the database
+    :param measurement_times: list of tuples (measurement name, time) of the points to be deleted
+    :return: True if the points have been deleted; False otherwise
+    """
+    if not measurement_times:
+        return True
+
+    statements = [f"DELETE FROM \"{measurement}\" WHERE time='{time}'" for measurement, time in measurement_times]
+    try:
+        client.query("; ".join(statements), method="POST")
+        return True
+    except Exception as e:
+        print(e)
+        return False
+
+
+def get_last_point_before(client, time):
+    """
+    Get the last point stored before a specific time, looking in all the month measurements with a single query
+
+    :param client: the client that connects with InfluxDB and allow us to interact with the database
+    :param time: the point before this time (not included) will be returned
+    :return: the point; None if there is no point before that time
+    """
+    result = client.query(f"SELECT * FROM {get_series_source()} WHERE time < '{time}' ORDER BY time DESC LIMIT 1")
+
+    # We get the last point of each measurement, so we keep the newest one
+    points = list(result.get_points())
+    if not points:
+        return None
+    return max(points, key=lambda point: point["time"])
+
+
+def get_totals_before(client, time):
+    """
+    Compute the total* fields (cumulative sums of the daily* fields) before a specific time. The sums are done by InfluxDB, so a
+    single query is needed whatever the number of days.
+
+    :param client: the client that connects with InfluxDB and allow us to interact with the database
+    :param time: the days before this time (not included) are added up
+    :return: a dictionary with the total* fields
+    """
+    sums = ", ".join(f"SUM({daily}) AS {total}" for daily, total in zip(utils.DAILY_FIELDS, utils.TOTAL_FIELDS))
+    result = client.query(f"SELECT {sums} FROM {get_series_source()} WHERE time < '{time}'")
+
+    # With the "monthly" schema we get the sum of each measurement
+    totals = dict.fromkeys(utils.TOTAL_FIELDS, 0)
+    for point in result.get_points():
+        for total in utils.TOTAL_FIELDS:
+            totals[total] += point[total] or 0
+    return totals
+
+
+def get_points_with_totals(client, start=None, end=None):
+    """
+    Get the points between two dates with the total* fields computed from the daily* fields (for utils.TS_TOTALS = "lazy").
+    Only two queries are done: the sum of all the days before the start and the points of the range, whose totals are the
+    running sum starting from there.
+
+    :param client: the client that connects with InfluxDB and allow us to interact with the database
+    :param start: first date of the range (included); None to start from the first day
+    :param end: last date of the range (included); None to finish at the last day
+    :return: a list of points sorted by time
+    """
+    totals = get_totals_before(client, start) if start else dict.fromkeys(utils.TOTAL_FIELDS, 0)
+
+    result = client.query(f"SELECT {', '.join(utils.DAILY_FIELDS)} FROM {get_series_source()}{get_range_condition(start, end)}")
+
+    points = sorted(result.get_points(), key=lambda point: point["time"])
+    return list(add_running_totals(points, totals))
+
+
+def get_range_condition(start=None, end=None):
+    """
+    :param start: first date of the range (included); None to start from the first day
+    :param end: last date of the range (included); None to finish at the last day
+    :return: the WHERE clause of the range (empty if there are no limits)
+    """
+    conditions = []
+    if start:
+        conditions.append(f"time >= '{start}'")
+    if end:
+        conditions.append(f"time <= '{end}'")
+    return f" WHERE {' AND '.join(conditions)}" if conditions else ""
+
+
+def add_running_totals(points, totals):
+    """
+    Add the total* fields to points that only have the daily* fields, as the running sum of the daily* fields
+
+    :param points: iterable of points sorted by time (it can be a generator, e.g. a chunk of a chunked query)
+    :param totals: dictionary with the total* fields of the day before the first point; it is updated while the points are
+    read, so it can be passed again with the next points of the same range
+    :return: a generator of the points with the total* fields
+    """
+    for point in points:
+        for daily, total in zip(utils.DAILY_FIELDS, utils.TOTAL_FIELDS):
+            totals[total] += point[daily] or 0
+            point[total] = totals[total]
+        yield point
+
+
+def get_monthly_sums(client):
+    """
+    Get the sum of the daily* fields and the number of days of each month of each year. The aggregation is done by InfluxDB in
+    a single request: grouping by the year and month tags with the "single" schema (and tags), or with one statement per month
+    of each year otherwise (all the statements are sent together).
+
+    :param client: the client that connects with InfluxDB and allow us to interact with the database
+    :return: a list of dictionaries with year (int), month (name), total_confirmed, total_deceased, total_recovered and total_days
+    """
+    sums = "SUM(dailyconfirmed) AS total_confirmed, SUM(dailydeceased) AS total_deceased, SUM(dailyrecovered) AS total_recovered, " \
+           "COUNT(dailyconfirmed) AS total_days"
+
+    monthly_sums = []
+    if utils.TS_SCHEMA == "single" and utils.TS_YEAR_MONTH_TAGS:
+        result = client.query(f"SELECT {sums} FROM {get_series_source()} GROUP BY year, month")
+        for (_, tags), points in result.items():
+            for point in points:
+                monthly_sums.append(create_month_sums(int(tags["year"]), tags["month"], [point]))
+    else:
+        # Only the months between the first and the last day stored
+        bounds = get_series_bounds(client)
+        if bounds is None:
+            return monthly_sums
+        first, last = bounds
+        months = [(year, n_month) for year in range(first.year, last.year + 1) for n_month in range(1, 13)
+                  if (first.year, first.month) <= (year, n_month) <= (last.year, last.month)]
+
+        statements = []
+        for year, n_month in months:
+            next_month = f"{year + 1}-01-01" if n_month == 12 else f"{year}-{n_month + 1:02d}-01"
+            statements.append(f"SELECT {sums} FROM {get_series_source()} WHERE time >= '{year}-{n_month:02d}-01' AND time < '{next_month}'")
+
+        # POST, since the request is too long for a GET
+        results = client.query("; ".join(statements), method="POST")
+        if not isinstance(results, list):
+            results = [results]
+
+        # With the "monthly" schema we might get a sum for each measurement
+        for (year, n_month), result in zip(months, results):
+            month_sums = create_month_sums(year, utils.MONTHS[n_month - 1], result.get_points())
+            if month_sums["total_days"]:
+                monthly_sums.append(month_sums)
+
+    return monthly_sums
+
+
+def get_series_bounds(client):
+    """
+    Get the first and the last day stored (both are found by InfluxDB in a single request)
+
+    :param client: the client that connects with InfluxDB and allow us to interact with the database
+    :return: tuple with the first and the last day (datetime); None if there are no days stored
+    """
+    results = client.query(f"SELECT FIRST(dailyconfirmed) FROM {get_series_source()}; "
+                           f"SELECT LAST(dailyconfirmed) FROM {get_series_source()}")
+    if not isinstance(results, list):
+        results = [results]
+
+    # With the "monthly" schema we get the first and the last day of each measurement
+    times = [point["time"][0:10] for result in results for point in result.get_points()]
+    if not times:
+        return None
+    return datetime.strptime(min(times), '%Y-%m-%d'), datetime.strptime(max(times), '%Y-%m-%d')
+
+
+def get_window_sums(client, start, end, window=7):
+    """
+    Add up the daily* fields of the days of a range in windows of some days. The sums are done by InfluxDB (GROUP BY time), so
+    only a point per window is returned whatever the length of the range. The windows start at the first date of the range.
+
+    :param client: the client that connects with InfluxDB and allow us to interact with the database
+    :param start: first date of the range (included, YYYY-MM-DD)
+    :param end: last date of the range (included, YYYY-MM-DD)
+    :param window: number of days of each window
+    :return: a list of dictionaries (one per window with data, sorted by time) with the time where the window starts, the sums
+    of the daily* fields and the number of days stored in the window
+    """
+    # Offset of the windows, so the first one starts at the first date (by default they start at 1970-01-01)
+    offset = (datetime.strptime(start, '%Y-%m-%d') - datetime(1970, 1, 1)).days % window
+
+    sums = ", ".join(f"SUM({daily}) AS {daily}" for daily in utils.DAILY_FIELDS)
+    result = client.query(f"SELECT {sums}, COUNT({utils.DAILY_FIELDS[0]}) AS days FROM {get_series_source()} "
+                          f"WHERE time >= '{start}' AND time <= '{end}' GROUP BY time({window}d, {offset}d) fill(none)")
+
+    # With the "monthly" schema we get the windows of each measurement, so the ones of the same time are added up
+    windows = {}
+    for point in result.get_points():
+        window_sums = windows.setdefault(point["time"], dict.fromkeys(utils.DAILY_FIELDS + ["days"], 0))
+        for field in window_sums:
+            window_sums[field] += point[field] or 0
+
+    return [{"time": time, **window_sums} for time, window_sums in sorted(windows.items())]
+
+
+def create_month_sums(year, month, points):
+    """
+    Add up the sums returned by InfluxDB for a month
+
+    :param year: the year
+    :param month: the name of the month
+    :param points: the points with the sums (total_confirmed, total_deceased, total_recovered and total_days)
+    :return: a dictionary with the year, the month and the sums
+    """
+    month_sums = {"year": year, "month": month, "total_confirmed": 0, "total_deceased": 0, "total_recovered": 0, "total_days": 0}
+    for point in points:
+        for field in ("total_confirmed", "total_deceased", "total_recovered", "total_days"):
+            month_sums[field] += point[field] or 0
+    return month_sums
+
+
+def get_series_source():
+    """
+    :return: the FROM clause with all the measurements where the days are stored (all the month measurements or the single
+    measurement, depending on utils.TS_SCHEMA), so a single query can read them all
+    """
+    if utils.TS_SCHEMA == "monthly":
+        return ", ".join(f'"{month}"' for month in utils.MONTHS)
+    return f'"{utils.TS_MEASUREMENT}"'
+
+
+def get_measurement(time):
+    """
+    Get the measurement where the day of the given time is stored
+
+    :param time: the time of the point (datetime or string starting with YYYY-MM-DD)
+    :return: the name of the month (with the "monthly" schema) or utils.TS_MEASUREMENT (with the "single" schema)
+    """
+    if utils.TS_SCHEMA == "monthly":
+        return utils.MONTHS[int(str(time)[5:7]) - 1]
+    return utils.TS_MEASUREMENT
+
+
+def get_tags(time):
+    """
+    Get the tags of the point of the given time
+
+    :param time: the time of the point (datetime or string starting with YYYY-MM-DD)
+    :return: a dictionary with the year and the month (with the "single" schema and utils.TS_YEAR_MONTH_TAGS); empty otherwise
+    """
+    if utils.TS_SCHEMA == "monthly" or not utils.TS_YEAR_MONTH_TAGS:
+        return {}
+    return {"year": str(time)[0:4], "month": utils.MONTHS[int(str(time)[5:7]) - 1]}
+
+
+def count_round_trips(client):
+    """
+    Count the requests that the client does to InfluxDB. Every request (queries and writes) goes through client.request, so it
+    is wrapped to increase client.round_trips. Set client.round_trips to 0 to start counting again.
+
+    :param client: the client that connects with InfluxDB
+    :return: the same client
+    """
+    request = client.request
+    client.round_trips = 0
+
+    def counted_request(*args, **kwargs):
+        client.round_trips += 1
+        return request(*args, **kwargs)
+
+    client.request = counted_request
+    return client
+
+
+def get_state_points(client, statecode):
+    """
+    Get all the points of a state. The state code is a tag, so InfluxDB uses its index instead of scanning the measurement.
+
+    :param client: the client that connects with InfluxDB and allow us to interact with the database
+    :param statecode: the code of the state (e.g. "MH")
+    :return: a list with the points of the state
+    """
+    return list(client.query(f"SELECT * FROM {utils.STATEWISE_MEASUREMENT} WHERE statecode = $statecode",
+                             bind_params={"statecode": statecode.upper()}).get_points())
 
 
 def get_current_time():
@@ -0,0 +1,193 @@
+"""
+This file will contain the CovidSeries class, which keeps the "cases_time_series" in memory as numpy arrays (the dates as
+datetime64 and the cases as int64 columns), so the analysis of the series is done with vectorized operations instead of loops
+over lists of dictionaries.
+"""
+from decimal import Decimal, ROUND_HALF_UP
+import numpy as np
+from timeSeriesDB import json_reader
+from timeSeriesDB import resources as res
+import utils
+
+
+class CovidSeries:
+    """
+    Daily series of the cases of India, sorted by date. The columns are named like the fields of the points:
+    dailyconfirmed, dailydeceased, dailyrecovered, totalconfirmed, totaldeceased and totalrecovered.
+    """
+
+    def __init__(self, dates, daily, totals=None):
+        """
+        :param dates: array (or list) with the day of each row
+        :param daily: matrix with the daily_* fields (one row per day, in the order of utils.DAILY_FIELDS)
+        :param totals: matrix with the total_* fields (in the order of utils.TOTAL_FIELDS); None to compute them as the
+        cumulative sum of the daily_* fields
+        """
+        dates = np.asarray(dates, dtype="datetime64[D]")
+        daily = np.asarray(daily, dtype=np.int64).reshape(-1, 3)
+        order = np.argsort(dates, kind="stable")
+
+        self.dates = dates[order]
+        self.daily = daily[order]
+        self.totals = np.cumsum(self.daily, axis=0) if totals is None else \
+            np.asarray(totals, dtype=np.int64).reshape(-1, 3)[order]
+
+    @classmethod
+    def from_arrays(cls, dates, daily, totals):
+        """
+        Create the series from arrays that are already sorted and typed (e.g. memory-mapped from a snapshot), without copying them
+
+        :param dates: array of datetime64[D] with the day of each row (sorted)
+        :param daily: int64 matrix with the daily_* fields
+        :param totals: int64 matrix with the total_* fields
+        :return: the series
+        """
+        series = cls.__new__(cls)
+        series.dates = dates
+        series.daily = daily
+        series.totals = totals
+        return series
+
+    @classmethod
+    def from_json(cls, json_file):
+        """
+        Load the series from the "cases_time_series" section of a json file (it is streamed, see json_reader)
+
+        :param json_file: the json file (like india_covid.json)
+        :return: the series
+        """
+        dates, daily, totals = [], [], []
+        for day in json_reader.read_cases_time_series(json_file):
+            dates.append(day["dateymd"])
+            daily.append([int(day[field]) for field in utils.DAILY_FIELDS])
+            totals.append([int(day[field]) for field in utils.TOTAL_FIELDS])
+        return cls(dates, daily, totals)
+
+    @classmethod
+    def from_points(cls, points):
+        """
+        Load the series from the points returned by a query (if they do not have the total_* fields, they are computed)
+
+        :param points: list of points (dictionaries with the time and the fields)
+        :return: the series
+        """
+        dates = [point["time"][0:10] for point in points]
+        daily = [[point.get(field) or 0 for field in utils.DAILY_FIELDS] for point in points]
+
+        totals = None
+        if points and all(point.get(field) is not None for point in points for field in utils.TOTAL_FIELDS):
+            totals = [[point[field] for field in utils.TOTAL_FIELDS] for point in points]
+        return cls(dates, daily, totals)
+
+    @classmethod
+    def from_influxdb(cls, client, start=None, end=None):
+        """
+        Load the series (or a range of it) from InfluxDB with a single query (and the sum of the days before the range with
+        lazy totals, see timeSeriesDB.resources.get_points_with_totals)
+
+        :param client: the client that connects with InfluxDB, with the time series database selected
+        :param start: first date of the range (included); None to start from the first day
+        :param end: last date of the range (included); None to finish at the last day
+        :return: the series
+        """
+        if utils.TS_TOTALS == "lazy":
+            # The total_* fields are the running sum from the days before the range
+            return cls.from_points(res.get_points_with_totals(client, start, end))
+
+        points = list(client.query(f"SELECT * FROM {res.get_series_source()}{res.get_range_condition(start, end)}").get_points())
+        return cls.from_points(points)
+
+    def __len__(self):
+        return len(self.dates)
+
+    def column(self, name):
+        """
+        :param name: the name of the column (e.g. "dailyconfirmed" or "totalconfirmed")
+        :return: the array of the column
+        """
+        if name in utils.DAILY_FIELDS:
+            return self.daily[:, utils.DAILY_FIELDS.index(name)]
+        return self.totals[:, utils.TOTAL_FIELDS.index(name)]
+
+    def rolling_mean(self, name="dailyconfirmed", window=7):
+        """
+        Mean of the last days of each day (computed with a cumulative sum, so it does not depend on the size of the window)
+
+        :param name: the name of the column
+        :param window: number of days of the mean
+        :return: array of floats (NaN for the first days, which do not have enough days before)
+        """
+        values = self.column(name).astype(np.float64)
+        means = np.full(len(values), np.nan)
+        if len(values) >= window:
+            cumsum = np.concatenate(([0.0], np.cumsum(values)))
+            means[window - 1:] = (cumsum[window:] - cumsum[:-window]) / window
+        return means
+
+    def growth_rate(self, name="totalconfirmed", periods=1):
+        """
+        Relative growth of a column with respect to some days before: value / value_before - 1
+
+        :param name: the name of the column
+        :param periods: number of days before
+        :return: array of floats (NaN when there is not a previous value or it is 0)
+        """
+        values = self.column(name).astype(np.float64)
+        rates = np.full(len(values), np.nan)
+        if len(values) > periods:
+            previous = values[:-periods]
+            with np.errstate(divide="ignore", invalid="ignore"):
+                rates[periods:] = np.where(previous > 0, values[periods:] / previous - 1, np.nan)
+        return rates
+
+    def doubling_time(self, name="totalconfirmed", window=7):
+        """
+        Days that a column takes to double at the growth of the last days: window * ln(2) / ln(value / value_window_days_before)
+
+        :param name: the name of the column (usually a total_* one)
+        :param window: number of days used to measure the growth
+        :return: array of floats (NaN when it does not grow or there are not enough days; inf is never returned)
+        """
+        growth = self.growth_rate(name, window)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            times = window * np.log(2) / np.log1p(growth)
+        times[~np.isfinite(times) | (growth <= 0)] = np.nan
+        return times
+
+    def group_by(self, period="month"):
+        """
+        Add up the daily_* fields of each month or year
+
+        :param period: "month" or "year"
+        :return: dictionary with the arrays of the groups (sorted by date):
+            year -> the year of each group
+            month -> the month of each group (1-12); None if grouped by year
+            sums -> matrix with the sums of the daily_* fields of each group
+            days -> number of days of each group
+            averages -> matrix with the averages of the daily_* fields of each group (rounded to 2 decimals, see round_average)
+        """
+        unit = "datetime64[M]" if period == "month" else "datetime64[Y]"
+        groups, index = np.unique(self.dates.astype(unit).astype(np.int64), return_inverse=True)
+
+        sums = np.zeros((len(groups), 3), dtype=np.int64)
+        np.add.at(sums, index, self.daily)
+        days = np.bincount(index, minlength=len(groups))
+
+        averages = np.array([[round_average(total, n_days) for total in row] for row, n_days in zip(sums.tolist(), days.tolist())],
+                            dtype=np.float64).reshape(-1, 3)
+
+        if period == "month":
+            return {"year": 1970 + groups // 12, "month": groups % 12 + 1, "sums": sums, "days": days, "averages": averages}
+        return {"year": 1970 + groups, "month": None, "sums": sums, "days": days, "averages": averages}
+
+
+def round_average(total, days):
+    """
+    Compute an average of the aggregate table rounded to 2 decimals like PostgreSQL rounds them (ROUND of a numeric: the halves
+    away from zero), so the rows written by the database and the ones computed here have the same averages
+
+    :param total: the sum of the values
+    :param days: the number of days
+    :return: the average as a float
+    """
+    return float((Decimal(total) / Decimal(days)).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP))
@@ -0,0 +1,140 @@
+"""
+RUN THIS FILE TO COMPILE THE SNAPSHOTS OF THE JSON FILES OF THE DATA DIRECTORY
+
+This file will contain the columnar snapshots of the "cases_time_series" of the json files. The series is decoded from the json
+file only once and saved as typed arrays (.npy files: the dates, the daily_* fields and the total_* fields), so loading it again
+is a memory map of these files instead of decoding the json file.
+
+Each snapshot remembers the checksum of the json file it was compiled from, and it is compiled again when the file changes. The
+size and the modification time of the file are checked first, so the checksum is only computed when they have changed.
+"""
+import os
+import json
+import numpy as np
+from timeSeriesDB.series import CovidSeries
+from timeSeriesDB import ingest
+import utils
+
+# Arrays of a snapshot (each one is saved in its own .npy file)
+ARRAYS = ("dates", "daily", "totals")
+
+
+def get_snapshot_dir(json_file):
+    """
+    :param json_file: the json file
+    :return: the directory where the snapshot of the json file is saved
+    """
+    root_dir = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+    name = os.path.splitext(os.path.basename(json_file))[0]
+    return os.path.join(root_dir, utils.TS_SNAPSHOT_DIR, name)
+
+
+def load_series(json_file):
+    """
+    Load the series of a json file from its snapshot, compiling the snapshot first if it does not exist or the file has changed
+
+    :param json_file: the json file (like india_covid.json)
+    :return: the series (its arrays are memory-mapped, read-only)
+    """
+    snapshot_dir = get_snapshot_dir(json_file)
+    if not is_up_to_date(json_file, snapshot_dir):
+        compile_snapshot(json_file, snapshot_dir)
+
+    arrays = [np.load(os.path.join(snapshot_dir, f"{name}.npy"), mmap_mode="r") for name in ARRAYS]
+    return CovidSeries.from_arrays(*arrays)
+
+
+def is_up_to_date(json_file, snapshot_dir):
+    """
+    Check if the snapshot of a json file has been compiled from the current content of the file
+
+    :param json_file: the json file
+    :param snapshot_dir: the directory of the snapshot
+    :return: True if the snapshot can be used; False if it has to be compiled
+    """
+    try:
+        with open(os.path.join(snapshot_dir, "meta.json")) as f:
+            meta = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return False
+
+    if not all(os.path.exists(os.path.join(snapshot_dir, f"{name}.npy")) for name in ARRAYS):
+        return False
+
+    # If the size and the modification time have not changed, the file has not changed
+    stat = os.stat(json_file)
+    if stat.st_size == meta["size"] and stat.st_mtime_ns == meta["mtime_ns"]:
+        return True
+
+    # The file might have been touched without changing it
+    if stat.st_size == meta["size"] and ingest.get_file_checksum(json_file) == meta["checksum"]:
+        meta["mtime_ns"] = stat.st_mtime_ns
+        save_meta(snapshot_dir, meta)
+        return True
+    return False
+
+
+def compile_snapshot(json_file, snapshot_dir):
+    """
+    Decode the series of a json file and save it as a snapshot. The metadata is saved at the end, so a snapshot which has not
+    been completely saved is never used.
+
+    :param json_file: the json file
+    :param snapshot_dir: the directory of the snapshot
+    :return: the number of days of the snapshot
+    """
+    os.makedirs(snapshot_dir, exist_ok=True)
+
+    # The old snapshot is not valid anymore
+    meta_file = os.path.join(snapshot_dir, "meta.json")
+    if os.path.exists(meta_file):
+        os.remove(meta_file)
+
+    stat = os.stat(json_file)
+    checksum = ingest.get_file_checksum(json_file)
+
+    series = CovidSeries.from_json(json_file)
+    for name in ARRAYS:
+        tmp_file = os.path.join(snapshot_dir, f"{name}.npy.tmp")
+        with open(tmp_file, "wb") as f:
+            np.save(f, np.ascontiguousarray(getattr(series, name)))
+        os.replace(tmp_file, os.path.join(snapshot_dir, f"{name}.npy"))
+
+    save_meta(snapshot_dir, {"source": os.path.basename(json_file), "checksum": checksum, "size": stat.st_size,
+                             "mtime_ns": stat.st_mtime_ns, "days": len(series)})
+    print(f"Snapshot of {json_file} compiled: {len(series)} days")
+    return len(series)
+
+
+def save_meta(snapshot_dir, meta):
+    """
+    Save the metadata of a snapshot (atomically)
+
+    :param snapshot_dir: the directory of the snapshot
+    :param meta: dictionary with the metadata
+    :return:
+    """
+    tmp_file = os.path.join(snapshot_dir, "meta.json.tmp")
+    with open(tmp_file, "w") as f:
+        json.dump(meta, f)
+    os.replace(tmp_file, os.path.join(snapshot_dir, "meta.json"))
+
+
+def main():
+    """
+    Compile the snapshots of all the json files of the data directory that have changed
+    :return:
+    """
+    dir_path = os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(__file__))), "data")
+
+    for json_file in sorted(os.listdir(dir_path)):
+        if json_file.endswith(".json"):
+            json_file = os.path.join(dir_path, json_file)
+            if is_up_to_date(json_file, get_snapshot_dir(json_file)):
+                print(f"Snapshot of {json_file} is up to date")
+            else:
+                compile_snapshot(json_file, get_snapshot_dir(json_file))
+
+
+if __name__ == '__main__':
+    main()
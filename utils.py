@@ -2,11 +2,116 @@
 This file will contain the global variables
 """
 
-# define table name
+# define table name (prefix of the old tables of one year, see relationalDB/migrate_aggregate_table.py)
 TABLE_NAME = "india_covid_"
 
+# Table with the aggregates of every month of every year (key = (year, month))
+AGGREGATE_TABLE = "india_covid_monthly"
+
+# True to partition the aggregate table by year (each year is stored in its own partition, e.g. india_covid_monthly_2020)
+AGGREGATE_PARTITIONED = True
+
+# Cache of the reads of the aggregate table (see relationalDB/cache.py): maximum number of reads kept and seconds they are kept
+AGGREGATE_CACHE_SIZE = 256
+AGGREGATE_CACHE_TTL_SECONDS = 60
+
 # define database name
 TS_DB_NAME = "weather_db"
 
+# PostgreSQL database (we have created the user and the database using pgAdmin)
+PG_DATABASE = "covid_world"
+PG_USER = "postgres"
+PG_PASSWORD = "postgres"
+
+# Size of the pool of connections to PostgreSQL
+PG_POOL_MIN = 1
+PG_POOL_MAX = 5
+
+# A connection that has not been used for these seconds is checked before using it
+PG_HEALTH_CHECK_SECONDS = 30
+
+# InfluxDB server
+TS_HOST = "localhost"
+TS_PORT = 8086
+
+# First year with data
+FIRST_YEAR = 2020
+
 # List of months
 MONTHS = ["January", "February", "March", "April", "May", "June", "July", "August", "September", "October", "November", "December"]
+
+# How the days are stored in InfluxDB:
+#   "monthly" -> one measurement per month name (all the years of a month are in the same measurement)
+#   "single" -> all the days in the TS_MEASUREMENT measurement, so a range of dates is read with a single scan
+TS_SCHEMA = "monthly"
+TS_MEASUREMENT = "cases"
+
+# With the "single" schema, add the year and the month (name) of each day as tags
+TS_YEAR_MONTH_TAGS = True
+
+# How the total* fields (cumulative sums) are handled:
+#   "stored" -> they are written with each point, so editing a past day rewrites the totals of all the next days
+#   "lazy" -> only the daily* fields are written and the totals are computed when they are read (reload the database with
+#             TS_LOAD_MODE = "full" when changing it)
+TS_TOTALS = "stored"
+
+# Fields of each day
+DAILY_FIELDS = ["dailyconfirmed", "dailydeceased", "dailyrecovered"]
+TOTAL_FIELDS = ["totalconfirmed", "totaldeceased", "totalrecovered"]
+
+# Sections of the json files that are loaded into the time series database
+TS_SECTIONS = ("cases_time_series", "statewise", "tested")
+
+# Measurements where the "statewise" and "tested" sections are stored
+STATEWISE_MEASUREMENT = "statewise"
+TESTED_MEASUREMENT = "tested"
+
+# Numeric fields of the "statewise" section
+STATEWISE_FIELDS = ["active", "confirmed", "deaths", "deltaconfirmed", "deltadeaths", "deltarecovered", "migratedother", "recovered"]
+
+# Maximum number of points written to InfluxDB in a single request when loading data
+TS_BATCH_SIZE = 5000
+
+# Compress the requests sent to InfluxDB (useful when the database is not running in localhost)
+TS_GZIP = False
+
+# Number of characters read each time when streaming a json file
+JSON_CHUNK_SIZE = 64 * 1024
+
+# Number of workers used to load the json files in parallel (None -> one per core)
+TS_INGEST_WORKERS = None
+
+# Load the json files with processes (True) or with threads (False)
+TS_INGEST_PROCESSES = True
+
+# How the json files are loaded: "full" drops the measurements and writes all the days; "incremental" only writes the days that
+# are new or have changed since the last load (see TS_WATERMARK_FILE)
+TS_LOAD_MODE = "incremental"
+
+# File (in the root of the project) where the state of the last load of each json file is saved
+TS_WATERMARK_FILE = ".ts_watermarks.json"
+
+# Directory (in the root of the project) where the columnar snapshots of the json files are saved (see timeSeriesDB/snapshot.py)
+TS_SNAPSHOT_DIR = ".snapshots"
+
+# Number of points (or rows) read from the databases each time by the export command
+EXPORT_CHUNK_SIZE = 1000
+
+# Default number of days of the windows of the stats command
+STATS_WINDOW_DAYS = 7
+
+# Show the number of requests done to InfluxDB by each command
+SHOW_ROUND_TRIPS = True
+
+# Write to InfluxDB and to PostgreSQL at the same time in each command (False to write them one after the other)
+CONCURRENT_WRITES = True
+
+# Apply the write commands in a background thread, so the prompt returns immediately (see write_queue.py)
+WRITE_BEHIND = False
+
+# Maximum number of write commands waiting to be applied, and file where they are saved until they are applied
+WRITE_QUEUE_SIZE = 1000
+WRITE_JOURNAL_FILE = ".write_journal.jsonl"
+
+# Seconds to wait before writing again the commands that could not be written
+WRITE_RETRY_SECONDS = 5
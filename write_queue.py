@@ -0,0 +1,243 @@
+"""
+This file contains the write-behind queue of the program. When it is enabled (utils.WRITE_BEHIND), the write commands are only
+checked, saved in a local journal and put in a queue, so the prompt returns immediately. A worker thread takes all the commands
+waiting in the queue and applies them together (see logic.apply_daily_changes): several changes of the same day become a single
+write and the changes of the same month become a single delta in the relational DB.
+
+The journal keeps the changes that have not been applied yet. If the program is closed (or crashes) before they are applied,
+they are applied the next time it starts. Replaying a change is safe, since a change sets the values of a day (it does not add
+them), so applying it again does not change anything. The commands are always applied in order: if a batch can not be written,
+it is retried (every utils.WRITE_RETRY_SECONDS) together with the commands that arrive later, never after them, so an old
+command of the journal can not be replayed on top of a newer one.
+"""
+import os
+import json
+import queue
+import threading
+from time import perf_counter
+import logic
+import utils
+
+
+class WriteBehindQueue:
+    """
+    Bounded queue of changes of the daily values with a worker thread that applies them to both databases
+    """
+
+    def __init__(self, client, journal_file=utils.WRITE_JOURNAL_FILE, max_size=utils.WRITE_QUEUE_SIZE):
+        """
+        :param client: the client which is connected to InfluxDB (only the worker thread uses it)
+        :param journal_file: the file where the changes that have not been applied yet are saved
+        :param max_size: maximum number of commands waiting in the queue (submit waits when it is full)
+        """
+        self.client = client
+        self.journal_file = journal_file
+        self.queue = queue.Queue(max_size)
+        self.journal_lock = threading.Lock()
+
+        # Commands saved in the journal that have not been applied yet (key = sequence number, value = changes)
+        self.pending = {}
+        self.next_seq = 0
+
+        # Commands of the batches that could not be written, retried before any later command
+        self.retry = []
+
+        self.stats = {"submitted": 0, "batches": 0, "applied": 0, "failed": 0, "written": 0, "deleted": 0, "months": 0,
+                      "retries": 0, "last_batch_seconds": 0.0, "last_error": None}
+
+        self.worker = threading.Thread(target=self.run_worker, name="write-behind", daemon=True)
+        self.worker.start()
+
+        # The changes of the last run that were not applied
+        self.replay_journal()
+
+    def submit(self, command):
+        """
+        Check a write command, save its changes in the journal and put them in the queue
+
+        :param command: the write command introduced by the user (insert, update, delete or insert-range)
+        :return: True if the command has been queued; False if it is not correct
+        """
+        changes = logic.parse_write_command(command)
+        if changes is None:
+            return False
+
+        with self.journal_lock:
+            seq = self.next_seq
+            self.next_seq += 1
+            self.pending[seq] = changes
+            self.append_to_journal(seq, changes)
+
+        self.stats["submitted"] += 1
+        self.queue.put((seq, changes))
+        return True
+
+    def run_worker(self):
+        """
+        Take the commands of the queue and apply them: all the commands that are waiting are applied together, after the commands
+        that could not be written before (if any)
+        :return:
+        """
+        stop = False
+        while not stop:
+            items = []
+            try:
+                # If some commands are waiting to be retried, they are retried after a while even if nothing else arrives
+                items.append(self.queue.get(timeout=utils.WRITE_RETRY_SECONDS if self.retry else None))
+            except queue.Empty:
+                pass
+
+            # Take all the other commands that are waiting (coalesced in the same write)
+            while True:
+                try:
+                    items.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            stop = None in items
+            batch = self.retry + [item for item in items if item is not None]
+            self.retry = []
+
+            if batch:
+                try:
+                    if not self.apply_batch(batch):
+                        self.retry = batch
+                except Exception as e:
+                    # E.g. the journal could not be rewritten (the commands have been applied, the journal is rewritten again
+                    # after the next batch)
+                    self.stats["last_error"] = str(e)
+                    print(e)
+
+            for _ in items:
+                self.queue.task_done()
+
+    def apply_batch(self, batch):
+        """
+        Apply a group of commands to both databases and remove them from the journal. If a database could not be written, the
+        commands are kept in the journal.
+
+        :param batch: list of tuples (sequence number, changes), in the order they were submitted
+        :return: True if the commands have been applied; False if they have to be retried
+        """
+        start = perf_counter()
+        changes = [change for _, command_changes in batch for change in command_changes]
+        try:
+            batch_stats = logic.apply_daily_changes(self.client, changes)
+            error = batch_stats["error"]
+        except Exception as e:
+            error = str(e)
+            print(e)
+
+        if error is not None:
+            # The commands stay in the journal and they are retried before any later command (if only one of the databases was
+            # written, the verify and repair commands find the months that are left behind)
+            self.stats["last_error"] = error
+            self.stats["retries"] += 1
+            return False
+
+        for key in ("applied", "failed", "written", "deleted", "months"):
+            self.stats[key] += batch_stats[key]
+        self.stats["batches"] += 1
+        self.stats["last_batch_seconds"] = perf_counter() - start
+
+        with self.journal_lock:
+            for seq, _ in batch:
+                del self.pending[seq]
+            self.rewrite_journal()
+        return True
+
+    def append_to_journal(self, seq, changes):
+        """
+        Add a command to the journal, making sure it is written to the disk before returning
+
+        :param seq: the sequence number of the command
+        :param changes: the changes of the command
+        :return:
+        """
+        with open(self.journal_file, "a") as journal:
+            journal.write(json.dumps({"seq": seq, "changes": changes}) + "\n")
+            journal.flush()
+            os.fsync(journal.fileno())
+
+    def rewrite_journal(self):
+        """
+        Write the journal again with only the commands that have not been applied yet (it is written to a temporary file first,
+        so the journal is never left half written)
+
+        :return:
+        """
+        if not self.pending:
+            if os.path.exists(self.journal_file):
+                os.remove(self.journal_file)
+            return
+
+        tmp_file = self.journal_file + ".tmp"
+        with open(tmp_file, "w") as journal:
+            for seq, changes in sorted(self.pending.items()):
+                journal.write(json.dumps({"seq": seq, "changes": changes}) + "\n")
+            journal.flush()
+            os.fsync(journal.fileno())
+        os.replace(tmp_file, self.journal_file)
+
+    def replay_journal(self):
+        """
+        Queue again the commands of the journal that were not applied the last time the program was run
+
+        :return: the number of commands queued
+        """
+        if not os.path.exists(self.journal_file):
+            return 0
+
+        commands = []
+        with open(self.journal_file) as journal:
+            for line in journal:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # The last line might be half written if the program crashed while writing it
+                    continue
+                commands.append([(date, tuple(values) if values else None, must_exist)
+                                 for date, values, must_exist in entry["changes"]])
+
+        with self.journal_lock:
+            for changes in commands:
+                seq = self.next_seq
+                self.next_seq += 1
+                self.pending[seq] = changes
+            self.rewrite_journal()
+            queued = sorted(self.pending.items())
+
+        for item in queued:
+            self.queue.put(item)
+
+        if queued:
+            print(f"{len(queued)} commands of the last run were not applied, they have been queued again")
+        return len(queued)
+
+    def flush(self):
+        """
+        Wait until all the commands of the queue have been applied (or have failed and are waiting to be retried, see get_status)
+
+        :return:
+        """
+        self.queue.join()
+
+    def get_status(self):
+        """
+        :return: dictionary with the commands waiting in the queue and the statistics of the worker
+        """
+        status = dict(self.stats)
+        status["retrying"] = len(self.retry)
+        with self.journal_lock:
+            status["pending"] = len(self.pending)
+        return status
+
+    def close(self):
+        """
+        Apply all the commands of the queue and stop the worker thread (the commands that can not be applied are kept in the
+        journal for the next run)
+
+        :return:
+        """
+        self.queue.put(None)
+        self.worker.join()